@@ -1,28 +1,88 @@
 import streamlit as st
 import pandas as pd
-import datetime
+import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
 import os
 import io
+import time
+import json
+import hashlib
+import heapq
 import requests
 # For Excel creation
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Border, Side, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
-from collections import defaultdict
+import xlsxwriter
+import functools
+from collections import defaultdict, Counter
 
 # Your modules
-from input import process_xlsx
+from input import read_tables, solver_input
 # main_process now returns (schedule_data, total_cost)
-from main import main_process
+from main import units_per_day, DEFAULT_SOLVER_OPTIONS, SOLVERS, TIME_UNIT_MINUTES, InfeasibleInput
+from cache import cache_clear
+from background import start_solve, poll_solve, stop_solve, cancel_solve
 
+# Time resolutions offered in the sidebar (minutes per time unit); each divides the quarter hours of
+# the template (off-grid times are rounded to the safe side, see main.task_units and main.shift_intervals)
+TIME_UNIT_CHOICES = [15, 5, 1]
 
-@st.cache_resource
-def load_workbook_cached(shift_excel_bytes):
-    """ 缓存 Excel 加载，避免重复加载导致刷新 """
-    shift_file = io.BytesIO(shift_excel_bytes)
-    shift_file.seek(0)
-    return load_workbook(shift_file)
+# Gantt chart: above GANTT_MAX_BARS bars, nearby bars of a lane are merged (from one pixel of GANTT_WIDTH_PX
+# apart up), and tasks get a row each only up to GANTT_MAX_TASK_ROWS; shift colors
+GANTT_MAX_BARS = 2000
+GANTT_WIDTH_PX = 1500
+GANTT_MAX_TASK_ROWS = 300
+GANTT_COLORS = px.colors.qualitative.Plotly
+
+# Task colors of the Excel exports and previews (see color_for_task)
+TASK_COLORS = [
+    "FFC7CE",  # red
+    "C6EFCE",  # green
+    "FFEB9C",  # yellow
+    "BDD7EE",  # blue
+    "D6DCE5",  # gray
+    "F8CBAD",  # peach
+    "E2EFDA",  # mint
+    "E4DFEC",  # lavender
+    "FFF2CC",  # light yellow
+    "DDEBF7"   # lighter blue
+]
+
+
+def schedule_hash(schedule_data, unit_minutes):
+    """Content hash of a schedule: the key of its views and exports in the caches below."""
+    payload = json.dumps([unit_minutes, schedule_data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# Views and exports of a schedule, built on first use and kept per schedule hash
+# (arguments starting with _ are not hashed by Streamlit: the hash already identifies them)
+@st.cache_data(show_spinner=False, max_entries=8)
+def schedule_layouts(schedule_key, unit_minutes, _schedule_data):
+    return shift_sheet_layouts(_schedule_data, unit_minutes)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def schedule_sheet_html(schedule_key, unit_minutes, sheet_name, _layout):
+    return sheet_html(_layout, unit_minutes)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def schedule_gantt_frame(schedule_key, unit_minutes, _schedule_data):
+    return gantt_frame(_schedule_data, unit_minutes)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def schedule_gantt_figure(schedule_key, unit_minutes, days, shifts, packed, _frame):
+    return gantt_figure(_frame[_frame["day"].isin(days) & _frame["shift"].isin(shifts)], packed)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def schedule_export(schedule_key, unit_minutes, kind, _schedule_data):
+    """The "gantt" or "nurses" workbook as bytes, built when its download is first requested."""
+    if kind == "gantt":
+        return create_excel_gantt_xlsx(_schedule_data, unit_minutes)
+    return create_shift_based_excel(_schedule_data, unit_minutes,
+                                    layouts=schedule_layouts(schedule_key, unit_minutes, _schedule_data))
 
 
 def main():
@@ -95,6 +155,10 @@ def main():
         index=0
     )
 
+    solver_options = show_solver_sidebar()
+    unit_minutes = st.sidebar.selectbox("Time Resolution (minutes)", TIME_UNIT_CHOICES,
+                                        index=TIME_UNIT_CHOICES.index(TIME_UNIT_MINUTES))
+
     # Show manual or upload sections
     if data_source == "Manual Input":
         show_manual_input()
@@ -117,7 +181,7 @@ def main():
 
     # Check if the data source has changed
     if data_source_changed and st.button("Run Scheduling Algorithm"):
-        with st.spinner("Running Scheduling..."):
+        with st.spinner("Starting Scheduling..."):
 
             if data_source == "Manual Input":
                 manual_shifts = st.session_state.get("manual_shifts", [])
@@ -136,63 +200,186 @@ def main():
                 if not uploaded_file:
                     st.error("No file uploaded!")
                     return
-                shifts_list, tasks_dict = process_xlsx(uploaded_file)
+                try:
+                    shifts_list, tasks_dict = solver_input(*read_tables(uploaded_file))
+                except ValueError as e:
+                    st.error(f"Invalid workbook: {e}")
+                    return
 
-            # Run scheduling algorithm and cache results
-            schedule_data, total_cost = main_process(tasks_dict, shifts_list)
-            st.session_state["schedule_data"] = schedule_data
-            st.session_state["total_cost"] = total_cost
-            st.session_state["gantt_excel_bytes"] = create_excel_gantt_xlsx(schedule_data)
-            st.session_state["shift_excel_bytes"] = create_shift_based_excel(schedule_data)
+            # Run scheduling algorithm in a background process (results are cached on disk)
+            if "solve_job" in st.session_state:
+                cancel_solve(st.session_state.pop("solve_job"))
+            initial_solution = st.session_state.get("solve_info") if solver_options["warm_start"] else None
+            incremental = st.session_state.get("incremental", False)
+            job = start_solve(
+                tasks_dict, shifts_list,
+                solver_options=solver_options,
+                initial_solution=initial_solution,
+                backend="mps",
+                aggregate=True,
+                unit_minutes=unit_minutes,
+                decompose=incremental,
+                previous=st.session_state.get("solve_info") if incremental else None
+            )
+            job["unit_minutes"] = unit_minutes
+            st.session_state["solve_job"] = job
+
+    follow_solve()
 
     # Display cached results if available
     if "schedule_data" in st.session_state and st.session_state["schedule_data"]:
         st.success("Scheduling Completed!")
+        schedule_data = st.session_state["schedule_data"]
+        unit_minutes = st.session_state.get("unit_minutes", TIME_UNIT_MINUTES)
+        if "schedule_hash" not in st.session_state:
+            st.session_state["schedule_hash"] = schedule_hash(schedule_data, unit_minutes)
+        schedule_key = st.session_state["schedule_hash"]
 
-        # Display Gantt chart
-        show_gantt_chart(st.session_state["schedule_data"])
-
-        # Display total cost
+        # Display total cost first; the views below are built when first opened
         if "total_cost" in st.session_state:
             st.write(f"### Total Weekly Cost: {st.session_state['total_cost']}")
-
-        # Download button for Gantt chart
-        if "gantt_excel_bytes" in st.session_state:
-            st.download_button(
-                label="Download as Excel",
-                data=st.session_state["gantt_excel_bytes"],
-                file_name="nurse_schedule.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
-
-        # Preview Excel file
-        preview_excel()
-
-        # Download button for detailed schedule
-        if "shift_excel_bytes" in st.session_state:
-            st.download_button(
-                label="Download Individual Nurse Schedule",
-                data=st.session_state["shift_excel_bytes"],
-                file_name="individual_nurse_schedule.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+        if st.session_state.get("solve_info"):
+            show_solve_info(st.session_state["solve_info"])
+
+        gantt_tab, nurses_tab = st.tabs(["Gantt Chart", "Individual Nurse Schedule"],
+                                        key="result_view", on_change="rerun")
+        if gantt_tab.open:
+            with gantt_tab:
+                show_gantt_chart(schedule_data, unit_minutes, schedule_key)
+                st.download_button(
+                    label="Download as Excel",
+                    data=functools.partial(schedule_export, schedule_key, unit_minutes, "gantt", schedule_data),
+                    file_name="nurse_schedule.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    on_click="ignore"
+                )
+        if nurses_tab.open:
+            with nurses_tab:
+                preview_excel(schedule_data, unit_minutes, schedule_key)
+                st.download_button(
+                    label="Download Individual Nurse Schedule",
+                    data=functools.partial(schedule_export, schedule_key, unit_minutes, "nurses", schedule_data),
+                    file_name="individual_nurse_schedule.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    on_click="ignore"
+                )
 
         # Display custom footer at the page bottom
     show_custom_footer()
 
 
-def get_cell_color(cell):
-    fill = cell.fill
-    if fill is None or fill.fill_type is None:
-        return "#FFFFFF"
-
-    if fill.fgColor.type == "rgb" and fill.fgColor.rgb:
-        return f"#{fill.fgColor.rgb[2:]}"
-
-    if fill.fgColor.type == "theme":
-        return "#D9EAD3"
-
-    return "#FFFFFF"
+def show_solver_sidebar():
+    """Solver choice and limits in the sidebar. Returns the solver_options for main_process."""
+    st.sidebar.header("Solver Settings")
+    solver = st.sidebar.selectbox("Solver", SOLVERS, index=SOLVERS.index(DEFAULT_SOLVER_OPTIONS["solver"]))
+    time_limit = st.sidebar.number_input("Time Limit (s, 0 = none)", min_value=0, value=0, step=10)
+    gap_pct = st.sidebar.number_input("Relative MIP Gap (%)", min_value=0.0, max_value=100.0, value=0.0, step=0.5)
+    threads = st.sidebar.number_input("Threads (0 = solver default)", min_value=0, value=0, step=1)
+    warm_start = st.sidebar.checkbox("Warm start from previous run", value=False,
+                                     disabled=not st.session_state.get("solve_info"))
+    heuristic_start = st.sidebar.checkbox("Start from the quick heuristic", value=False,
+                                          help="Gives the MIP solver a feasible schedule to start from. "
+                                               "Choose the 'quick' solver to return that schedule directly.")
+    st.sidebar.checkbox("Incremental re-solve (only days that changed)", value=False, key="incremental",
+                        help="Solves day groups that share no shift separately and reuses the previous "
+                             "solution of every group whose tasks and shifts did not change.")
+    if st.sidebar.button("Clear schedule cache"):
+        cache_clear()
+        st.sidebar.success("Cache cleared.")
+    return {
+        "solver": solver,
+        "time_limit": time_limit or None,
+        "gap_rel": gap_pct / 100 if gap_pct else None,
+        "threads": threads or None,
+        "warm_start": warm_start,
+        "heuristic_start": heuristic_start,
+        "msg": False
+    }
+
+
+def follow_solve():
+    """Live progress of the background solve with stop and cancel buttons; stores the schedule once it is done."""
+    job = st.session_state.get("solve_job")
+    if job is None:
+        return
+    buttons = st.empty()
+    with buttons.container():
+        col1, col2 = st.columns(2)
+        if col1.button("Stop and use best schedule"):
+            stop_solve(job)
+        if col2.button("Cancel"):
+            cancel_solve(job)
+            del st.session_state["solve_job"]
+            buttons.empty()
+            st.warning("Scheduling cancelled.")
+            return
+    progress = st.empty()
+    while not poll_solve(job, timeout=0.5):
+        with progress.container():
+            show_solve_progress(job)
+    buttons.empty()
+    progress.empty()
+    if st.session_state.get("solve_job") is job:
+        del st.session_state["solve_job"]
+    if isinstance(job["error"], InfeasibleInput):
+        st.error(f"No schedule can cover {len(job['error'].problems)} task(s); fix these before solving:")
+        st.dataframe(pd.DataFrame(job["error"].problems)[["day", "task", "time_unit", "message"]], hide_index=True)
+        return
+    if job["error"] is not None:
+        st.error(f"Scheduling failed: {job['error']}")
+        return
+    schedule_data, total_cost, solve_info = job["result"]
+    unit_minutes = job["unit_minutes"]
+    st.session_state["schedule_data"] = schedule_data
+    st.session_state["total_cost"] = total_cost
+    st.session_state["solve_info"] = solve_info
+    st.session_state["unit_minutes"] = unit_minutes
+    st.session_state["schedule_hash"] = schedule_hash(schedule_data, unit_minutes)
+
+
+def show_solve_progress(job):
+    """Phase, best schedule cost, bound and gap of the running solve, and their history."""
+    events = job["progress"]
+    phase = events[-1]["phase"] if events else "starting"
+    if events and "groups_done" in events[-1]:
+        phase = f"solve ({events[-1]['groups_done']} of {events[-1]['groups']} day groups)"
+    incumbent = next((e["incumbent"] for e in reversed(events) if e.get("incumbent") is not None), None)
+    bound = next((e["bound"] for e in reversed(events) if e.get("bound") is not None), None)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Phase", phase)
+    col2.metric("Best Schedule Cost", "n/a" if incumbent is None else f"{incumbent:.2f}")
+    col3.metric("Best Bound", "n/a" if bound is None else f"{bound:.2f}")
+    col4.metric("Gap", "n/a" if incumbent is None or bound is None
+                else f"{max(0.0, incumbent - bound) / max(abs(incumbent), 1e-10):.2%}")
+    history = pd.DataFrame([e for e in events if e.get("incumbent") is not None or e.get("bound") is not None],
+                           columns=["elapsed", "incumbent", "bound"])
+    if len(history) > 1:
+        st.line_chart(history.set_index("elapsed").ffill())
+    st.caption(f"Running for {time.time() - job['started']:.0f} s")
+
+
+def show_solve_info(solve_info):
+    """Solver status, gap and wall time of the last run."""
+    gap = solve_info["gap"]
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Solver Status", f"{solve_info['status']} ({solve_info['solver']})")
+    col2.metric("MIP Gap", "n/a" if gap is None else f"{gap:.2%}")
+    col3.metric("Solve Time", f"{solve_info['wall_time']:.1f} s")
+    if "resolved" in solve_info:
+        st.caption(f"Re-solved {solve_info['resolved']} of {solve_info['subproblems']} day groups.")
+    if solve_info.get("lower_bound"):
+        st.caption(f"Demand lower bound: {solve_info['lower_bound']:.2f} "
+                   f"(the schedule costs {solve_info['objective'] / solve_info['lower_bound'] - 1:.1%} more).")
+    if solve_info.get("cache_hit"):
+        st.info("Same data and solver settings as an earlier run: schedule loaded from the cache.")
+    if "timings" in solve_info:
+        st.caption(" · ".join(f"{phase} {seconds:.2f} s" for phase, seconds in solve_info["timings"].items()))
+    if solve_info["solver"] == "quick":
+        st.warning("Quick heuristic schedule: feasible, but not optimized by a MIP solver.")
+    elif solve_info.get("stopped"):
+        st.warning("Stopped early: this is the best schedule the solver had found.")
+    elif solve_info["status"] != "optimal":
+        st.warning("The solver stopped before proving optimality; this is the best schedule it found.")
 
 
 def show_custom_header():
@@ -347,52 +534,140 @@ def show_upload_section():
         st.session_state["uploaded_file"] = None
 
 
-def show_gantt_chart(schedule_data):
+def show_gantt_chart(schedule_data, unit_minutes=TIME_UNIT_MINUTES, schedule_key=None):
     st.write("### Schedule Gantt Chart")
-    gantt_data = []
-    for day_key, jobs_dict in schedule_data.items():
-        # day_key can be int or str
-        day_index = 0
-        if isinstance(day_key, int):
-            day_index = day_key
-        elif isinstance(day_key, str) and day_key.isdigit():
-            day_index = int(day_key)
+    if schedule_key is None:
+        schedule_key = schedule_hash(schedule_data, unit_minutes)
+    frame = schedule_gantt_frame(schedule_key, unit_minutes, schedule_data)
+    if frame.empty:
+        st.info("No data to display for Gantt chart.")
+        return
+
+    all_days = sorted(frame["day"].unique().tolist())
+    all_shifts = sorted(frame["shift"].unique().tolist())
+    col1, col2, col3 = st.columns([2, 2, 1])
+    days = col1.multiselect("Days", all_days, default=all_days, key="gantt_days")
+    shifts = col2.multiselect("Shifts", all_shifts, default=all_shifts, format_func=lambda i: f"Shift {i}",
+                              key="gantt_shifts")
+    packed = col3.radio("Rows", ["Packed lanes", "One per task"], key="gantt_rows") == "Packed lanes"
+
+    fig, stats = schedule_gantt_figure(schedule_key, unit_minutes, tuple(days), tuple(shifts), packed, frame)
+    if fig is None:
+        st.info("No tasks on the selected days and shifts.")
+        return
+    if not packed and stats["tasks"] > GANTT_MAX_TASK_ROWS:
+        st.caption(f"Over {GANTT_MAX_TASK_ROWS} tasks: showing them packed into lanes.")
+    st.caption(f"{stats['tasks']} tasks in {stats['rows']} rows, drawn as {stats['bars']} bars.")
+    st.plotly_chart(fig, width="stretch")
 
-        base_day = datetime.datetime(2025, 1, 1) + datetime.timedelta(days=day_index)
 
+def gantt_frame(schedule_data, unit_minutes=TIME_UNIT_MINUTES):
+    """One row per scheduled task: day, task, start and finish, most nurses at once and the shift most of its nurse time comes from."""
+    rows = []
+    for day_key, jobs_dict in schedule_data.items():
         for task_id, val in jobs_dict.items():
-            if len(val) < 2:
-                continue
-            blocks = val[0]
-            if not blocks:
+            if len(val) < 2 or not val[0]:
                 continue
-            start_block = min(blocks)
-            end_block = max(blocks) + 1
-            start_min = start_block*15
-            end_min = end_block*15
-            start_time = base_day + datetime.timedelta(minutes=start_min)
-            end_time = base_day + datetime.timedelta(minutes=end_min)
-            shift_str = str(val[1])[:30]
-            gantt_data.append({
-                "Task": f"Day{day_key}_Job{task_id}",
-                "Start": start_time,
-                "Finish": end_time,
-                "Resource": shift_str
-            })
-
-    if gantt_data:
-        df_gantt = pd.DataFrame(gantt_data)
-        fig = px.timeline(
-            df_gantt,
-            x_start="Start",
-            x_end="Finish",
-            y="Task",
-            color="Resource"
-        )
-        fig.update_yaxes(autorange="reversed")
-        st.plotly_chart(fig, use_container_width=True)
+            blocks, nurses = val[0], val[1]
+            shift_counts = Counter(shift for unit in nurses for shift in unit)
+            rows.append((convert_day_key_to_int(day_key), task_id, min(blocks), max(blocks) + 1,
+                         max((len(unit) for unit in nurses), default=0),
+                         int(shift_counts.most_common(1)[0][0]) if shift_counts else -1))
+    frame = pd.DataFrame(rows, columns=["day", "task", "first_block", "end_block", "nurses", "shift"])
+    # Minutes since the start of the week, and the same as times on a calendar week
+    frame["start"] = frame["day"] * 24 * 60 + frame["first_block"] * unit_minutes
+    frame["finish"] = frame["day"] * 24 * 60 + frame["end_block"] * unit_minutes
+    week_start = pd.Timestamp(2025, 1, 1)
+    frame["Start"] = week_start + pd.to_timedelta(frame["start"], unit="min")
+    frame["Finish"] = week_start + pd.to_timedelta(frame["finish"], unit="min")
+    return frame
+
+
+def pack_lanes(start, finish):
+    """Lane of every bar: in start order each bar takes the lowest lane free by then, which uses the fewest lanes possible."""
+    lanes = np.empty(len(start), dtype=np.int64)
+    running = []  # (finish, lane) of the bars placed so far that may still be running
+    free = []
+    for i in np.argsort(start, kind="stable").tolist():
+        while running and running[0][0] <= start[i]:
+            heapq.heappush(free, heapq.heappop(running)[1])
+        lanes[i] = heapq.heappop(free) if free else len(running)
+        heapq.heappush(running, (finish[i], lanes[i]))
+    return lanes
+
+
+def merge_bars(bars, tolerance):
+    """Bars of the same row and shift at most tolerance minutes apart, merged into one (server-side downsampling)."""
+    bars = bars.sort_values(["shift", "row", "start"])
+    shift, row = bars["shift"].to_numpy(), bars["row"].to_numpy()
+    start, finish = bars["start"].to_numpy(), bars["finish"].to_numpy()
+    # Bars of one row never overlap, so the gap to the bar before is all there is to check
+    new_bar = np.ones(len(bars), dtype=bool)
+    new_bar[1:] = (shift[1:] != shift[:-1]) | (row[1:] != row[:-1]) | (start[1:] - finish[:-1] > tolerance)
+    merged = bars.groupby(np.cumsum(new_bar)).agg(shift=("shift", "first"), row=("row", "first"),
+                                                  start=("start", "min"), finish=("finish", "max"),
+                                                  day=("day", "first"), task=("task", "first"),
+                                                  tasks=("tasks", "sum"), nurses=("nurses", "max"))
+    return merged
+
+
+def gantt_figure(frame, packed=True, max_bars=GANTT_MAX_BARS):
+    """WebGL Gantt chart of the tasks in frame (see gantt_frame), one trace per shift.
+
+    packed=True stacks the tasks into as few lanes as possible; otherwise
+    every task gets its own row, up to GANTT_MAX_TASK_ROWS tasks. When there
+    are more than max_bars bars, nearby bars of one lane and shift are
+    merged until at most max_bars are left. Returns (figure, stats) with the number
+    of tasks, rows and bars drawn; the figure is None when frame is empty.
+    """
+    if frame.empty:
+        return None, {"tasks": 0, "rows": 0, "bars": 0}
+    bars = frame[["day", "task", "shift", "nurses", "start", "finish"]].assign(tasks=1)
+    if packed or len(bars) > GANTT_MAX_TASK_ROWS:
+        bars["row"] = pack_lanes(bars["start"].to_numpy(), bars["finish"].to_numpy())
+        labels = None
     else:
-        st.info("No data to display for Gantt chart.")
+        bars = bars.sort_values(["day", "task"])
+        bars["row"] = np.arange(len(bars))
+        labels = [f"Day{day}_Job{task}" for day, task in zip(bars["day"], bars["task"])]
+    n_rows = int(bars["row"].max()) + 1
+    tasks = len(bars)
+    if tasks > max_bars:
+        # Start at about a pixel and widen until few enough bars are left
+        span = bars["finish"].max() - bars["start"].min()
+        tolerance = span / GANTT_WIDTH_PX
+        merged = merge_bars(bars, tolerance)
+        while len(merged) > max_bars and tolerance < span:
+            tolerance *= 2
+            merged = merge_bars(bars, tolerance)
+        bars = merged
+        hover = "%{customdata[3]} tasks from day %{customdata[0]}, task %{customdata[1]}<br>up to %{customdata[2]} nurses"
+    else:
+        hover = "Day %{customdata[0]}, task %{customdata[1]}<br>%{customdata[2]} nurses"
+
+    # Numbers rather than dates and strings, so plotly sends every array base64 encoded
+    week_start_ms = pd.Timestamp(2025, 1, 1).value // 10**6
+    width = max(2, min(18, 500 // n_rows))
+    fig = go.Figure()
+    for shift, group in bars.groupby("shift", sort=True):
+        n = len(group)
+        # Each bar is one line segment; a NaN point breaks the line between bars
+        x = np.full(3 * n, np.nan)
+        x[0::3] = week_start_ms + group["start"].to_numpy() * 60000.0
+        x[1::3] = week_start_ms + group["finish"].to_numpy() * 60000.0
+        y = np.full(3 * n, np.nan, dtype=np.float32)
+        y[0::3] = y[1::3] = group["row"].to_numpy()
+        customdata = group[["day", "task", "nurses", "tasks"]].to_numpy()
+        customdata = np.repeat(customdata.astype(np.min_scalar_type(int(customdata.max()))), 3, axis=0)
+        fig.add_trace(go.Scattergl(x=x, y=y, mode="lines", name=f"Shift {shift}", customdata=customdata,
+                                   line=dict(width=width, color=GANTT_COLORS[shift % len(GANTT_COLORS)]),
+                                   hovertemplate=hover))
+    fig.update_xaxes(type="date")
+    fig.update_yaxes(autorange="reversed", title="Lane" if labels is None else None,
+                     tickmode="array" if labels else "auto",
+                     tickvals=list(range(len(labels))) if labels else None, ticktext=labels)
+    fig.update_layout(height=min(900, max(300, n_rows * (width + 4) + 120)), legend_title_text="Shift")
+    return fig, {"tasks": tasks, "rows": n_rows, "bars": len(bars)}
 
 
 def convert_day_key_to_int(day_key):
@@ -404,29 +679,24 @@ def convert_day_key_to_int(day_key):
     return 9999
 
 
-def create_excel_gantt_xlsx(schedule_data: dict) -> bytes:
+def create_excel_gantt_xlsx(schedule_data: dict, unit_minutes: int = TIME_UNIT_MINUTES) -> bytes:
     """
     Creates an Excel workbook with a matrix-like Gantt for each day.
-    Rows = tasks, columns = 15-min blocks, colored cells = active intervals.
-    Returns the workbook as bytes.
+    Rows = tasks, columns = unit_minutes blocks, colored cells = active intervals.
+    Returns the workbook as bytes. Rows are written in order and streamed to
+    disk (xlsxwriter constant_memory), with one shared format per color.
     """
-    wb = Workbook()
-    used_default_sheet = False
-
     day_keys_sorted = sorted(schedule_data.keys(), key=convert_day_key_to_int)
     if not day_keys_sorted:
         return b""
 
+    output = io.BytesIO()
+    wb = xlsxwriter.Workbook(output, {"constant_memory": True})
+    formats = excel_formats(wb)
+
     for day_key in day_keys_sorted:
         day_index = convert_day_key_to_int(day_key)
-
-        sheet_name = f"Day{day_index}"
-        if not used_default_sheet:
-            ws = wb.active
-            ws.title = sheet_name
-            used_default_sheet = True
-        else:
-            ws = wb.create_sheet(title=sheet_name)
+        ws = wb.add_worksheet(f"Day{day_index}")
 
         jobs_dict = schedule_data[day_key]
         all_blocks = []
@@ -441,53 +711,41 @@ def create_excel_gantt_xlsx(schedule_data: dict) -> bytes:
         max_block = max(all_blocks)
 
         # Row 1: time labels
-        for col_i, block in enumerate(range(min_block, max_block + 1), start=2):
-            minute_offset = block * 15
-            hh = minute_offset // 60
-            mm = minute_offset % 60
-            time_label = f"{hh:02d}:{mm:02d}"
-            cell = ws.cell(row=1, column=col_i)
-            cell.value = time_label
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-
-        row_i = 2
-        sorted_job_items = sorted(jobs_dict.items(), key=lambda x: convert_day_key_to_int(x[0]))
-        for task_key, val in sorted_job_items:
-            ws.cell(row=row_i, column=1).value = f"Task {task_key}"
-            ws.cell(row=row_i, column=1).alignment = Alignment(horizontal="left")
+        time_labels = [f"{block * unit_minutes // 60:02d}:{block * unit_minutes % 60:02d}"
+                       for block in range(min_block, max_block + 1)]
+        ws.write_row(0, 1, time_labels, formats["time"])
 
+        sorted_job_items = sorted(jobs_dict.items(), key=lambda x: convert_day_key_to_int(x[0]))
+        for row_i, (task_key, val) in enumerate(sorted_job_items, start=1):
+            ws.write_string(row_i, 0, f"Task {task_key}", formats["task"])
             if len(val) < 1:
-                row_i += 1
                 continue
+            fill = formats["fill", color_for_task(task_key)]
+            for block in val[0]:
+                ws.write_blank(row_i, block - min_block + 1, None, fill)
 
-            time_slots = val[0]
-            for block in time_slots:
-                col_i = (block - min_block) + 2
-                fill = PatternFill("solid", fgColor=color_for_task(task_key))
-                ws.cell(row=row_i, column=col_i).fill = fill
+        ws.freeze_panes(1, 1)
 
-            row_i += 1
+    wb.close()
+    return output.getvalue()
 
-        ws.freeze_panes = "B2"
 
-    output = io.BytesIO()
-    wb.save(output)
-    return output.getvalue()
+def excel_formats(wb):
+    """Formats of the exports, created once per workbook: time and label cells, and the fill and task block of each color."""
+    formats = {
+        "time": wb.add_format({"align": "center", "valign": "vcenter"}),
+        "task": wb.add_format({"align": "left"}),
+        "nurse": wb.add_format({"align": "right"}),
+    }
+    for color in TASK_COLORS:
+        formats["fill", color] = wb.add_format({"pattern": 1, "bg_color": f"#{color}"})
+        formats["block", color] = wb.add_format({"pattern": 1, "bg_color": f"#{color}", "border": 1,
+                                                 "text_wrap": True, "align": "center", "valign": "vcenter"})
+    return formats
 
 
 def color_for_task(task_key_str: str) -> str:
-    palette = [
-        "FFC7CE",  # red
-        "C6EFCE",  # green
-        "FFEB9C",  # yellow
-        "BDD7EE",  # blue
-        "D6DCE5",  # gray
-        "F8CBAD",  # peach
-        "E2EFDA",  # mint
-        "E4DFEC",  # lavender
-        "FFF2CC",  # light yellow
-        "DDEBF7"   # lighter blue
-    ]
+    palette = TASK_COLORS
     try:
         if isinstance(task_key_str, int):
             t_int = task_key_str
@@ -502,60 +760,51 @@ def color_for_task(task_key_str: str) -> str:
 
 
 # Individual Nurse Schedule from here
-def find_available_rows(row_occupancy, start_time, end_time, required_rows):
-    for row in range(2, 500):
-        is_available = True
-        for t in range(start_time, end_time + 1):
-            if any(row + i in row_occupancy[t] for i in range(required_rows)):
-                is_available = False
-                break
-        if is_available:
-            return row
-    return None
-
-
-def create_shift_based_excel(schedule_data):
-    thin_border = Border(left=Side(style='thin'),
-                         right=Side(style='thin'),
-                         top=Side(style='thin'),
-                         bottom=Side(style='thin'))
-
+def first_free_row(occupied, required_rows):
+    """Lowest row from 2 on that starts required_rows free rows, given the set of (first, last) occupied row ranges."""
+    row = 2
+    for first, last in sorted(occupied):
+        if first - row >= required_rows:
+            break
+        row = max(row, last + 1)
+    return row
+
+
+def shift_sheet_layouts(schedule_data, unit_minutes=TIME_UNIT_MINUTES):
+    """Layout of every day/shift sheet of the individual nurse schedule.
+
+    Returns {sheet name: layout}; a layout holds the first and last time
+    block of the shift, the number of nurse rows and one (task, first block,
+    last block, first row, rows) entry per task block, in placement order.
+    Both create_shift_based_excel and sheet_html draw from it.
+    """
     day_shift_data = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: defaultdict(int))))
     task_nurses_count = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
 
     for day_str in schedule_data:
         day = int(day_str)
         for task_id, (time_blocks, nurses_list) in schedule_data[day_str].items():
-            day_blocks = [t % 96 for t in time_blocks]
+            day_blocks = [t % units_per_day(unit_minutes) for t in time_blocks]
             for t_day, nurses in zip(day_blocks, nurses_list):
                 shift_counts = defaultdict(int)
                 for shift_id in nurses:
                     shift_counts[int(shift_id)] += 1
                 for shift_id, count in shift_counts.items():
                     day_shift_data[day][shift_id][t_day][task_id] = count
-                    if task_nurses_count[day][shift_id][task_id] == 0:
-                        task_nurses_count[day][shift_id][task_id] = count
-
-    wb = Workbook()
-    if 'Sheet' in wb.sheetnames:
-        del wb['Sheet']
+                    task_nurses_count[day][shift_id][task_id] = max(task_nurses_count[day][shift_id][task_id], count)
 
+    layouts = {}
     for day in day_shift_data:
         for shift_id in day_shift_data[day]:
-            # Get shift start and end blocks (time in 15-minute intervals)
+            # Get shift start and end blocks (time in unit_minutes intervals)
             shift_start_block = min(day_shift_data[day][shift_id].keys())
             shift_end_block = max(day_shift_data[day][shift_id].keys())
-
-            sheet_name = f"day_{day}_shift_{shift_id}"
-            ws = wb.create_sheet(title=sheet_name)
-
-            for col in range(shift_start_block, shift_end_block + 1):
-                time_str = f"{col // 4:02d}:{(col % 4) * 15:02d}"
-                cell = ws.cell(1, col - shift_start_block + 2, time_str)
-                cell.alignment = Alignment(horizontal='center')
-                ws.column_dimensions[get_column_letter(col - shift_start_block + 2)].width = 7
-
-            row_occupancy = defaultdict(set)
+            blocks = []
+            # Task blocks are placed in start order, so a block only collides with the placed blocks
+            # still running at its start: their (last block, first row, last row) in a heap by last block
+            # and the set of their row ranges
+            active = []
+            occupied = set()
 
             for t in range(shift_start_block, shift_end_block + 1):
                 tasks = day_shift_data[day][shift_id][t]
@@ -571,103 +820,130 @@ def create_shift_based_excel(schedule_data):
                                task_id in day_shift_data[day][shift_id][merge_end + 1]):
                             merge_end += 1
 
-                        start_row = find_available_rows(row_occupancy, merge_start, merge_end, required_rows)
-                        if start_row is None:
-                            continue
-
+                        while active and active[0][0] < merge_start:
+                            _, first_row, last_row = heapq.heappop(active)
+                            occupied.discard((first_row, last_row))
+                        start_row = first_free_row(occupied, required_rows)
                         end_row = start_row + required_rows - 1
-                        cell = ws.cell(row=start_row, column=merge_start - shift_start_block + 2)
-                        cell.value = f"Task {task_id}\nNurses: {required_rows}"
-                        cell.alignment = Alignment(wrapText=True, horizontal='center', vertical='center')
-                        cell.fill = PatternFill("solid", fgColor=color_for_task(str(task_id)))
-
-                        ws.merge_cells(start_row=start_row, end_row=end_row,
-                                       start_column=merge_start - shift_start_block + 2,
-                                       end_column=merge_end - shift_start_block + 2)
+                        heapq.heappush(active, (merge_end, start_row, end_row))
+                        occupied.add((start_row, end_row))
+                        blocks.append((task_id, merge_start, merge_end, start_row, required_rows))
+
+            layouts[f"day_{day}_shift_{shift_id}"] = {
+                "first_block": shift_start_block,
+                "last_block": shift_end_block,
+                "rows": max((start_row + required_rows - 1 for _, _, _, start_row, required_rows in blocks), default=1),
+                "blocks": blocks,
+            }
+    return layouts
 
-                        for t_block in range(merge_start, merge_end + 1):
-                            for row in range(start_row, end_row + 1):
-                                row_occupancy[t_block].add(row)
 
-                        for r in range(start_row, end_row + 1):
-                            for c in range(merge_start, merge_end + 1):
-                                ws.cell(r, c - shift_start_block + 2).border = thin_border
+def create_shift_based_excel(schedule_data, unit_minutes=TIME_UNIT_MINUTES, layouts=None):
+    """The individual nurse schedule workbook as bytes; layouts defaults to shift_sheet_layouts(schedule_data).
 
-            max_row = max(max(rows) if rows else 1 for rows in row_occupancy.values())
-            for row in range(2, max_row + 1):
-                ws.cell(row, 1, f"Nurse {row - 1}")
-                ws.cell(row, 1).alignment = Alignment(horizontal='right')
+    Like create_excel_gantt_xlsx, rows are written in order and streamed to
+    disk (xlsxwriter constant_memory).
+    """
+    if layouts is None:
+        layouts = shift_sheet_layouts(schedule_data, unit_minutes)
 
     output = io.BytesIO()
-    wb.save(output)
+    wb = xlsxwriter.Workbook(output, {"constant_memory": True})
+    formats = excel_formats(wb)
+
+    for sheet_name, layout in layouts.items():
+        ws = wb.add_worksheet(sheet_name)
+        shift_start_block = layout["first_block"]
+        n_cols = layout["last_block"] - shift_start_block + 1
+        time_labels = [f"{col * unit_minutes // 60:02d}:{col * unit_minutes % 60:02d}"
+                       for col in range(shift_start_block, layout["last_block"] + 1)]
+        ws.write_row(0, 1, time_labels, formats["time"])
+        ws.set_column(1, n_cols, 7)
+
+        # A row is flushed once a later one is written, so the cells of every block are sorted into their rows first
+        row_cells = defaultdict(list)
+        for task_id, merge_start, merge_end, start_row, required_rows in layout["blocks"]:
+            text = f"Task {task_id}\nNurses: {required_rows}"
+            block = formats["block", color_for_task(str(task_id))]
+            first_row, first_col = start_row - 1, merge_start - shift_start_block + 1
+            last_row, last_col = first_row + required_rows - 1, merge_end - shift_start_block + 1
+            for row in range(first_row, last_row + 1):
+                row_cells[row].append((first_col, last_col, block, (text, last_row) if row == first_row else None))
+
+        for row in range(1, layout["rows"]):
+            ws.write_string(row, 0, f"Nurse {row}", formats["nurse"])
+            for first_col, last_col, block, top in row_cells[row]:
+                if top is None:
+                    for col in range(first_col, last_col + 1):
+                        ws.write_blank(row, col, None, block)
+                    continue
+                text, last_row = top
+                if (row, first_col) != (last_row, last_col):
+                    # Without a format merge_range writes no blank cells into the rows below yet;
+                    # they are written with the block format as their rows come
+                    ws.merge_range(row, first_col, last_row, last_col, text, None)
+                ws.write_string(row, first_col, text, block)
+                for col in range(first_col + 1, last_col + 1):
+                    ws.write_blank(row, col, None, block)
+
+    wb.close()
     return output.getvalue()
 
 
-def generate_html_table_with_merge(sheet):
-
-    merged_cells = sheet.merged_cells.ranges
-    merged_map = {}
-
-    for merge_range in merged_cells:
-        start_cell = merge_range.start_cell
-        merged_map[(merge_range.min_row, merge_range.min_col)] = (merge_range.max_row, merge_range.max_col)
-
-    table_html = "<table style='border-collapse:collapse; width:100%;'>"
-
-    for row_index, row in enumerate(sheet.iter_rows()):
-        table_html += "<tr>"
-        for col_index, cell in enumerate(row):
-            cell_key = (cell.row, cell.column)
-            cell_ref = f"{get_column_letter(cell.column)}{cell.row}"
-
-            column_style = "min-width: 75px; font-weight: bold;" if col_index == 0 else ""
-
-            if cell_key in merged_map:
-                max_row, max_col = merged_map[cell_key]
-                rowspan = max_row - cell.row + 1
-                colspan = max_col - cell.column + 1
-                bg_color = get_cell_color(cell)
-                table_html += (
-                    f'<td style="background-color:{bg_color}; padding:4px; border:1px solid #ccc; {column_style}" '
-                    f'rowspan="{rowspan}" colspan="{colspan}">' f'{cell.value or ""}</td>'
-                )
-            elif not any(cell_ref in merge_range for merge_range in merged_cells):
-                bg_color = get_cell_color(cell)
-                table_html += (
-                    f'<td style="background-color:{bg_color}; padding:4px; border:1px solid #ccc; {column_style}">'
-                    f'{cell.value or ""}</td>'
-                )
-        table_html += "</tr>"
-
-    table_html += "</table>"
-    return table_html
-
-
-def preview_excel():
-    if "shift_excel_bytes" not in st.session_state:
-        st.error("No scheduling data available. Please run the scheduling algorithm first.")
+def sheet_html(layout, unit_minutes=TIME_UNIT_MINUTES):
+    """HTML table of one shift_sheet_layouts sheet as Excel shows it: task blocks span their rows and columns."""
+    first_block = layout["first_block"]
+    n_rows, n_cols = layout["rows"], layout["last_block"] - first_block + 2
+    # Cells hidden under a task block, and the block that starts in each top-left cell
+    covered = np.zeros((n_rows + 1, n_cols + 1), dtype=bool)
+    anchors = {}
+    for task_id, merge_start, merge_end, start_row, required_rows in layout["blocks"]:
+        col = merge_start - first_block + 2
+        covered[start_row:start_row + required_rows, col:merge_end - first_block + 3] = True
+        anchors[(start_row, col)] = (task_id, required_rows, merge_end - merge_start + 1)
+
+    cell_style = "padding:4px; border:1px solid #ccc; "
+    label_style = "min-width: 75px; font-weight: bold;"
+    html = ["<table style='border-collapse:collapse; width:100%;'>"]
+    for row in range(1, n_rows + 1):
+        html.append("<tr>")
+        html.append(f'<td style="background-color:#FFFFFF; {cell_style}{label_style}">'
+                    f'{f"Nurse {row - 1}" if row > 1 else ""}</td>')
+        for col in range(2, n_cols + 1):
+            if (row, col) in anchors:
+                task_id, rowspan, colspan = anchors[(row, col)]
+                html.append(f'<td style="background-color:#{color_for_task(str(task_id))}; {cell_style}" '
+                            f'rowspan="{rowspan}" colspan="{colspan}">Task {task_id}\nNurses: {rowspan}</td>')
+            elif not covered[row, col]:
+                if row == 1:
+                    minutes = (col - 2 + first_block) * unit_minutes
+                    html.append(f'<td style="background-color:#FFFFFF; {cell_style}">{minutes // 60:02d}:{minutes % 60:02d}</td>')
+                else:
+                    html.append(f'<td style="background-color:#FFFFFF; {cell_style}"></td>')
+        html.append("</tr>")
+    html.append("</table>")
+    return "".join(html)
+
+
+def preview_excel(schedule_data, unit_minutes=TIME_UNIT_MINUTES, schedule_key=None):
+    if schedule_key is None:
+        schedule_key = schedule_hash(schedule_data, unit_minutes)
+    layouts = schedule_layouts(schedule_key, unit_minutes, schedule_data)
+    sheets = list(layouts)
+    if not sheets:
+        st.info("No nurse schedule sheets to preview.")
         return
-
-    if "workbook" not in st.session_state:
-        st.session_state["workbook"] = load_workbook_cached(st.session_state["shift_excel_bytes"])
-    wb = st.session_state["workbook"]
-
-    sheets = wb.sheetnames
-    if "selected_sheet" not in st.session_state:
+    if st.session_state.get("selected_sheet") not in sheets:
         st.session_state["selected_sheet"] = sheets[0]
-        st.session_state["html_preview"] = generate_html_table_with_merge(wb[sheets[0]])
 
     selected_sheet = st.selectbox("Select a sheet to preview", sheets,
                                   index=sheets.index(st.session_state["selected_sheet"]), key="sheet_selector")
+    st.session_state["selected_sheet"] = selected_sheet
 
-    if selected_sheet != st.session_state["selected_sheet"]:
-        st.session_state["selected_sheet"] = selected_sheet
-        st.session_state["html_preview"] = generate_html_table_with_merge(wb[selected_sheet])
-
-    st.write(f"### Preview of Sheet: {st.session_state['selected_sheet']}")
+    st.write(f"### Preview of Sheet: {selected_sheet}")
     st.markdown(
         f'<div style="overflow:auto; max-width:100%; max-height:500px;">'
-        f'{st.session_state.get("html_preview", "Loading...")}'
+        f'{schedule_sheet_html(schedule_key, unit_minutes, selected_sheet, layouts[selected_sheet])}'
         f'</div>',
         unsafe_allow_html=True
     )
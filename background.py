@@ -0,0 +1,93 @@
+import os
+import time
+import queue
+import signal
+import multiprocessing
+import cache
+
+
+def solve_worker(events, stop, args, kwargs):
+    #Runs in the worker process: progress events first, then the result or the error
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp() #Own process group, so end_process also ends the pool workers and CBC runs started here
+    try:
+        result = cache.cached_main_process(*args, progress=events.put, stop=stop.is_set, **kwargs)
+        events.put({'phase': 'result', 'result': result})
+    except Exception as e:
+        events.put({'phase': 'error', 'error': e})
+
+
+def start_solve(*args, **kwargs):
+    """Run cache.cached_main_process(*args, **kwargs) in a worker process.
+
+    Returns the job dict that poll_solve and stop_solve take; its
+    'progress' list collects the main_process progress events.
+    """
+    context = multiprocessing.get_context('spawn')
+    job = {'events': context.Queue(), 'stop': context.Event(), 'progress': [],
+           'result': None, 'error': None, 'started': time.time()}
+    #Not a daemon: decomposed solves start a process pool of their own
+    job['process'] = context.Process(target=solve_worker, args=(job['events'], job['stop'], args, kwargs))
+    job['process'].start()
+    return job
+
+
+def poll_solve(job, timeout=0.0):
+    """Collect the events the worker sent, waiting up to timeout seconds for the first.
+
+    Returns True once the job is done: then job['result'] holds
+    (result, cost, info) or job['error'] the exception it raised.
+    """
+    alive = job['process'].is_alive()
+    while True:
+        try:
+            event = job['events'].get(timeout=timeout)
+        except queue.Empty:
+            break
+        timeout = 0.0
+        if event['phase'] == 'result':
+            job['result'] = event['result']
+        elif event['phase'] == 'error':
+            job['error'] = event['error']
+        else:
+            job['progress'].append(event)
+    if not alive and job['result'] is None and job['error'] is None:
+        job['error'] = RuntimeError(f"The solver process exited unexpectedly (exit code {job['process'].exitcode})")
+    done = job['result'] is not None or job['error'] is not None
+    if done:
+        end_process(job)
+    return done
+
+
+def stop_solve(job):
+    #Ask the solver to end its search; the job then finishes with the best schedule found so far
+    job['stop'].set()
+
+
+def cancel_solve(job, timeout=5.0):
+    """Stop a job whose result is no longer wanted and end its worker process.
+
+    The worker cannot exit before its queued events are read, so they are
+    drained (and dropped) while it winds down; a worker still running after
+    timeout seconds is terminated.
+    """
+    job['stop'].set()
+    deadline = time.time() + timeout
+    while job['process'].is_alive() and time.time() < deadline:
+        try:
+            job['events'].get(timeout=0.1)
+        except queue.Empty:
+            pass
+    end_process(job)
+
+
+def end_process(job, timeout=1.0):
+    #Reap the worker once its events are read, terminating it (and its process group) if it does not exit in time
+    job['process'].join(timeout)
+    if job['process'].is_alive():
+        try:
+            os.killpg(job['process'].pid, signal.SIGTERM)
+        except (AttributeError, ProcessLookupError): #No process groups, or the worker has not made its own yet
+            job['process'].terminate()
+        job['process'].join()
+    job['events'].close()
@@ -0,0 +1,844 @@
+import os
+import io
+import sys
+import time
+import tempfile
+import datetime
+import tracemalloc
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import random
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Border, Side, Alignment, PatternFill
+from openpyxl.utils import get_column_letter
+
+import main
+import cache
+import input
+import app
+from generate_random_task import generate_week
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    value = func(*args, **kwargs)
+    return value, time.perf_counter() - start
+
+
+def traced(func, *args, **kwargs):
+    #Peak traced Python/NumPy memory of one call (tracing slows the call down, so time it separately)
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def lp_file_size(opt_model):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'model.lp')
+        opt_model.writeLP(path)
+        return os.path.getsize(path)
+
+
+def bench_sparse(sizes=(5, 10, 20, 40, 70)):
+    """Dense vs sparse start variables: model size and PuLP build time."""
+    print(f"{'tasks/day':>9} {'builder':>7} {'vars':>8} {'rows':>6} {'build s':>8} {'LP MB':>7}")
+    for n in sizes:
+        tasks, shifts = generate_week(n)
+        for sparse in (False, True):
+            model, seconds = timed(main.build_model, tasks, shifts, sparse=sparse)
+            opt_model = model['opt_model']
+            size_mb = lp_file_size(opt_model) / 1e6
+            print(f"{n:>9} {'sparse' if sparse else 'dense':>7} {opt_model.numVariables():>8} "
+                  f"{opt_model.numConstraints():>6} {seconds:>8.2f} {size_mb:>7.1f}")
+
+
+def bench_build(sizes=(10, 25, 50, 100, 200, 500)):
+    """Growth of the sparse model build time with the number of tasks per day."""
+    print(f"{'tasks/day':>9} {'vars':>8} {'nonzeros':>9} {'build s':>8}")
+    for n in sizes:
+        tasks, shifts = generate_week(n)
+        model, seconds = timed(main.build_model, tasks, shifts)
+        opt_model = model['opt_model']
+        nonzeros = sum(len(constraint) for constraint in opt_model.constraints.values())
+        print(f"{n:>9} {opt_model.numVariables():>8} {nonzeros:>9} {seconds:>8.2f}")
+
+
+def write_pulp_model(tasks, shifts, path):
+    #What opt_model.solve() does before CBC starts: build the PuLP model and write it as MPS
+    main.build_model(tasks, shifts)['opt_model'].writeMPS(path, rename=1)
+
+
+def write_mps_model(tasks, shifts, path):
+    main.write_mps(main.model_data(tasks, shifts), path)
+
+
+def bench_backends(sizes=(10, 50, 100, 200, 500)):
+    """PuLP objects vs the streaming MPS writer: time and peak memory until CBC can start."""
+    print(f"{'tasks/day':>9} {'backend':>7} {'build s':>8} {'peak MB':>8}")
+    for n in sizes:
+        tasks, shifts = generate_week(n)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'model.mps')
+            for name, writer in (('pulp', write_pulp_model), ('mps', write_mps_model)):
+                _, seconds = timed(writer, tasks, shifts, path)
+                peak = traced(writer, tasks, shifts, path)
+                print(f"{n:>9} {name:>7} {seconds:>8.2f} {peak / 1e6:>8.1f}")
+
+
+def bench_threads(sizes=(10,), threads=(1, 2, 3, 1)):
+    """HiGHS thread counts changed between solves in one process, on both backends (each must solve)."""
+    print(f"{'week':>14} {'backend':>7} {'threads':>7} {'cost':>10} {'status':>9} {'wall s':>7}")
+    for name, tasks, shifts in sample_weeks(sizes):
+        for backend in ('pulp', 'mps'):
+            for count in threads:
+                options = {'solver': 'HiGHS', 'threads': count, 'msg': False, 'time_limit': 60}
+                (_, cost, info), seconds = timed(main.main_process, tasks, shifts, backend=backend, aggregate=True,
+                                                 solver_options=options, return_info=True)
+                print(f"{name:>14} {backend:>7} {count:>7} {cost:>10.2f} {info['status']:>9} {seconds:>7.2f}")
+
+
+def per_day_shifts(shifts):
+    #One copy of every shift template per working day, so every day is its own subproblem
+    return [dict(shift, days=day) for shift in shifts for day in shift['days'].split(',')]
+
+
+def bench_decompose(sizes=(10, 20, 40)):
+    """Monolithic vs decomposed solve (CBC via the MPS backend, 60 s limit per model)."""
+    options = {'msg': False, 'time_limit': 60}
+    print(f"{'tasks/day':>9} {'templates':>9} {'mode':>10} {'models':>6} {'cost':>10} {'status':>9} {'wall s':>7}")
+    for n in sizes:
+        tasks, shifts = generate_week(n)
+        for templates, week_shifts in (('shared', shifts), ('per-day', per_day_shifts(shifts))):
+            for decompose in (False, True):
+                (_, cost, info), seconds = timed(main.main_process, tasks, week_shifts, backend='mps',
+                                                 solver_options=options, return_info=True, decompose=decompose)
+                print(f"{n:>9} {templates:>9} {'decomposed' if decompose else 'monolithic':>10} "
+                      f"{info.get('subproblems', 1):>6} {cost:>10.2f} {info['status']:>9} {seconds:>7.2f}")
+
+
+def sample_weeks(sizes):
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    shifts, tasks = input.process_xlsx(os.path.join(current_dir, 'Template with examples.xlsx'))
+    yield 'template', tasks, shifts
+    for n in sizes:
+        tasks, shifts = generate_week(n)
+        yield f'random {n}/day', tasks, shifts
+
+
+def bench_aggregate(sizes=(10, 20)):
+    """Full time grid vs the event grid: columns, coverage rows and solve time (CBC, MPS backend)."""
+    options = {'msg': False, 'time_limit': 120}
+    print(f"{'week':>14} {'grid':>5} {'columns':>7} {'rows':>5} {'cost':>10} {'status':>9} {'wall s':>7}")
+    for name, tasks, shifts in sample_weeks(sizes):
+        for aggregate in (False, True):
+            data = main.model_data(tasks, shifts, aggregate)
+            (_, cost, info), seconds = timed(main.main_process, tasks, shifts, backend='mps', aggregate=aggregate,
+                                             solver_options=options, return_info=True)
+            print(f"{name:>14} {'event' if aggregate else 'full':>5} {len(data['col_task']):>7} "
+                  f"{len(data['set_R']):>5} {cost:>10.2f} {info['status']:>9} {seconds:>7.2f}")
+
+
+def bench_resolution(sizes=(10,), units=(15, 5, 1)):
+    """Model size, build time and solve time at 15, 5 and 1 minute time units (HiGHS, MPS backend)."""
+    options = {'solver': 'HiGHS', 'msg': False, 'time_limit': 120}
+    print(f"{'week':>14} {'unit':>4} {'model':>6} {'columns':>7} {'rows':>5} {'build s':>8} {'cost':>10} {'status':>9} {'wall s':>7}")
+    for name, tasks, shifts in sample_weeks(sizes):
+        for unit_minutes in units:
+            for aggregate in (False, True):
+                data, build_seconds = timed(main.model_data, tasks, shifts, aggregate, unit_minutes)
+                (_, cost, info), seconds = timed(main.main_process, tasks, shifts, backend='mps', aggregate=aggregate,
+                                                 unit_minutes=unit_minutes, solver_options=options, return_info=True)
+                print(f"{name:>14} {unit_minutes:>4} {'event' if aggregate else 'sparse':>6} {len(data['col_task']):>7} "
+                      f"{len(data['set_R']):>5} {build_seconds:>8.2f} {cost:>10.2f} {info['status']:>9} {seconds:>7.2f}")
+
+
+def bench_concurrency(sizes=(8,), tasks_per_day=4):
+    """Stress test: solve N schedules in parallel threads and compare with sequential solves."""
+    for n in sizes:
+        weeks = []
+        for seed in range(n):
+            random.seed(seed)
+            weeks.append(generate_week(tasks_per_day))
+        options = {'msg': False}
+        sequential, sequential_seconds = timed(
+            lambda: [main.main_process(tasks, shifts, aggregate=True, solver_options=options) for tasks, shifts in weeks])
+        with ThreadPoolExecutor(max_workers=n) as executor:
+            parallel, parallel_seconds = timed(lambda: list(executor.map(
+                lambda week: main.main_process(*week, aggregate=True, solver_options=options), weeks)))
+        mismatches = [seed for seed, (a, b) in enumerate(zip(sequential, parallel)) if a != b]
+        print(f"{n} schedules: sequential {sequential_seconds:.2f} s, threads {parallel_seconds:.2f} s, "
+              f"mismatches {mismatches or 'none'}")
+        if mismatches:
+            raise SystemExit(1)
+
+
+def legacy_time_to_unit(day, clock):
+    #15-minute time unit of the 'HH:MM' clock time on the given day, as main.py computed it before the masks
+    return (day*24*60 + main.clock_minutes(clock)) // 15
+
+
+def legacy_shift_binary(shifts, horizon):
+    #Shift availability as main.py built it before the masks: list scans per shift and time unit
+    set_L = []
+    for row in shifts:
+        units = []
+        for day in row['days'].split(','):
+            start_unit = legacy_time_to_unit(int(day), row['start_time'])
+            end_unit = legacy_time_to_unit(int(day), row['end_time'])
+            break_units = []
+            for clock in row['break_time'].split(','):
+                break_unit = legacy_time_to_unit(int(day), clock)
+                break_units.extend(range(break_unit, break_unit + int(row['break_duration'] / 15)))
+            units.extend(t for t in range(start_unit, end_unit) if t not in break_units)
+        set_L.append([1 if t in units else 0 for t in range(horizon)])
+    return set_L
+
+
+def random_shift_templates(n):
+    shifts = []
+    for _ in range(n):
+        start = random.randint(0, 80)
+        end = random.randint(start + 8, 95)
+        breaks = sorted(random.sample(range(start, end), 2))
+        shifts.append({'start_time': f"{start // 4:02d}:{start % 4 * 15:02d}",
+                       'end_time': f"{end // 4:02d}:{end % 4 * 15:02d}",
+                       'break_time': ','.join(f"{b // 4:02d}:{b % 4 * 15:02d}" for b in breaks),
+                       'break_duration': 30, 'cost': 100.0,
+                       'days': ','.join(str(d) for d in sorted(random.sample(range(7), random.randint(1, 7))))})
+    return shifts
+
+
+def bench_masks(sizes=(200,)):
+    """List-scan shift availability vs NumPy masks for many shift templates over one week."""
+    horizon = 7 * main.units_per_day()
+    for n in sizes:
+        shifts = random_shift_templates(n)
+        legacy, legacy_seconds = timed(legacy_shift_binary, shifts, horizon)
+        masks, mask_seconds = timed(main.shift_masks, shifts, horizon)
+        assert (masks == np.array(legacy, dtype=bool)).all()
+        print(f"{n} templates: list scans {legacy_seconds * 1e3:.1f} ms, masks {mask_seconds * 1e3:.2f} ms")
+
+
+def legacy_extract(opt_model):
+    #Solution extraction as main.py did it before the variable handles: parse every variable name
+    amount_of_scheduled_nurses = {}
+    starting_times_tasks = []
+    for v in opt_model.variables():
+        if v.name[0] == 'y':
+            amount_of_scheduled_nurses[int(v.name.split('_')[1])] = v.varValue
+        elif v.name[0] == 'x' and (v.varValue or 0) > 0:
+            _, task, time_unit = v.name.split('_')
+            starting_times_tasks.append((int(task), int(time_unit)))
+    return amount_of_scheduled_nurses, starting_times_tasks
+
+
+def bench_extract(sizes=(10, 50, 200)):
+    """Name parsing vs variable handles for reading a solved PuLP model (CBC, 30 s limit)."""
+    options = dict(main.DEFAULT_SOLVER_OPTIONS, msg=False, time_limit=30)
+    print(f"{'tasks/day':>9} {'vars':>8} {'names ms':>9} {'handles ms':>10}")
+    for n in sizes:
+        tasks, shifts = generate_week(n)
+        data = main.build_model(tasks, shifts)
+        _, starts, info = main.solve_pulp(data, options)
+        (_, legacy_starts), legacy_seconds = timed(legacy_extract, data['opt_model'])
+        assert sorted(legacy_starts) == sorted(starts)
+        print(f"{n:>9} {data['opt_model'].numVariables():>8} {legacy_seconds * 1e3:>9.1f} "
+              f"{info['timings']['extract'] * 1e3:>10.1f}")
+
+
+def legacy_take_nurse(scheduled_nurses, time_unit, number_of_needed_nurses):
+    #Nurse assignment as main.py did it before assign_nurses: greedy per time unit, shift ids only
+    result = []
+    for key, item in scheduled_nurses[time_unit].items():
+        if item > 0:
+            taken_nurses = min(item, number_of_needed_nurses)
+            scheduled_nurses[time_unit][key] = item - taken_nurses
+            result.extend([key] * int(taken_nurses))
+            if taken_nurses == number_of_needed_nurses:
+                return result
+            number_of_needed_nurses -= taken_nurses
+
+
+def legacy_assign(set_L, counts, starting_times_tasks, D, N):
+    scheduled_nurses = [dict(enumerate(row)) for row in (set_L.T * np.array(counts, dtype=float)).tolist()]
+    return {task: [legacy_take_nurse(scheduled_nurses, t, N[task]) for t in range(start, start + D[task])]
+            for task, start in starting_times_tasks}
+
+
+def bench_assign(sizes=(10, 40, 100)):
+    """Greedy take_nurse vs the sweep-line assign_nurses on solved weeks (HiGHS, 60 s limit)."""
+    options = {'solver': 'HiGHS', 'msg': False, 'time_limit': 60}
+    print(f"{'week':>14} {'greedy ms':>9} {'sweep ms':>8} {'nurse changes':>13}")
+    for name, tasks, shifts in sample_weeks(sizes):
+        _, _, info = main.main_process(tasks, shifts, backend='mps', aggregate=True,
+                                       solver_options=options, return_info=True)
+        data = main.model_data(tasks, shifts)
+        counts = [info['shift_counts'][i] for i in data['set_I']]
+        starts = list(info['start_times'].items())
+        _, legacy_seconds = timed(legacy_assign, data['set_L'], counts, starts, data['D'], data['N'])
+        assignment, seconds = timed(main.assign_nurses, data['set_L'], counts, starts, data['D'], data['N'])
+        changes = sum(len(set(unit) - set(units[u-1])) for units in assignment.values()
+                      for u, unit in enumerate(units) if u)
+        print(f"{name:>14} {legacy_seconds * 1e3:>9.1f} {seconds * 1e3:>8.1f} {changes:>13}")
+
+
+def sorted_units(result):
+    return {day: {task: [units, [sorted(unit) for unit in nurses]] for task, (units, nurses) in tasks.items()}
+            for day, tasks in result.items()}
+
+
+def bench_results(sizes=(10, 40)):
+    """Legacy results.json vs the compact JSON and NumPy formats: file size, save and load time."""
+    options = {'solver': 'HiGHS', 'msg': False, 'time_limit': 60}
+    print(f"{'week':>14} {'format':>7} {'KB':>8} {'save ms':>8} {'load ms':>8}")
+    for name, tasks, shifts in sample_weeks(sizes):
+        result, cost = main.main_process(tasks, shifts, backend='mps', aggregate=True, solver_options=options)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for result_format, file_name in (('legacy', 'legacy.json'), ('compact', 'results.json'), ('npz', 'results.npz')):
+                path = os.path.join(tmp_dir, file_name)
+                if result_format == 'legacy':
+                    _, save_seconds = timed(input.save_results_to_json, (result, cost), path)
+                else:
+                    _, save_seconds = timed(input.save_results, result, cost, path)
+                (loaded, loaded_cost), load_seconds = timed(input.load_results, path)
+                assert sorted_units(loaded) == sorted_units(result) and loaded_cost == cost
+                print(f"{name:>14} {result_format:>7} {os.path.getsize(path) / 1e3:>8.1f} "
+                      f"{save_seconds * 1e3:>8.1f} {load_seconds * 1e3:>8.1f}")
+
+
+def legacy_process_xlsx(file_path):
+    #input.process_xlsx before read_tables: one read per sheet and iterrows
+    xls = pd.ExcelFile(file_path)
+    df = pd.read_excel(xls, sheet_name=xls.sheet_names[0], dtype=str)
+    shifts = [{'start_time': row['start_time'][:5], 'end_time': row['end_time'][:5],
+               'break_time': row['break_time'][:5], 'break_duration': int(row['break_duration']),
+               'cost': float(row['cost']), 'days': row['days']} for _, row in df.iterrows()]
+    tasks = {}
+    for i in range(1, len(xls.sheet_names)):
+        df = pd.read_excel(xls, sheet_name=xls.sheet_names[i], dtype=str)
+        tasks[str(i-1)] = [{'start_time': row['start_time'][:5], 'end_time': row['end_time'][:5],
+                            'duration': row['duration'][:5], 'nurses_required': int(row['nurses_required'])}
+                           for _, row in df.iterrows()]
+    return shifts, tasks
+
+
+def write_workbook(path, rows):
+    #Template shifts and `rows` random tasks spread over the seven day sheets
+    shifts = pd.read_excel(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Template with examples.xlsx'),
+                           sheet_name=0, dtype=str)
+    rng = np.random.default_rng(0)
+    start = rng.integers(0, 60, rows)
+    duration = rng.integers(1, 20, rows)
+    end = np.minimum(start + duration + rng.integers(0, 16, rows), 95)
+    clock = lambda units: [f"{u // 4:02d}:{u % 4 * 15:02d}" for u in units]
+    tasks = pd.DataFrame({'start_time': clock(start), 'end_time': clock(end), 'duration': clock(duration),
+                          'nurses_required': rng.integers(1, 4, rows).astype(str)})
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        shifts.to_excel(writer, sheet_name='shift', index=False)
+        for day, rows_of_day in enumerate(np.array_split(np.arange(rows), 7)):
+            tasks.iloc[rows_of_day].to_excel(writer, sheet_name=str(day), index=False)
+
+
+def bench_ingest(sizes=(1000, 10000, 100000)):
+    """Workbook parsing: iterrows per sheet vs read_tables with openpyxl and calamine."""
+    print(f"{'rows':>7} {'reader':>17} {'read s':>7} {'parse s':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in sizes:
+            path = os.path.join(tmp_dir, f'tasks_{rows}.xlsx')
+            write_workbook(path, rows)
+            expected, seconds = timed(legacy_process_xlsx, path)
+            print(f"{rows:>7} {'iterrows':>17} {seconds:>7.2f} {'':>8}")
+            engines = ['openpyxl', 'calamine'] if input.excel_engine() == 'calamine' else ['openpyxl']
+            for engine in engines:
+                sheets, read_seconds = timed(input.read_sheets, path, engine)
+                sheets = list(sheets.items())
+                def parse():
+                    shifts = input.shift_table(sheets[0][1])
+                    tasks = pd.concat([input.task_table(df, day) for day, (_, df) in enumerate(sheets[1:])],
+                                      ignore_index=True)
+                    tasks.attrs['days'] = len(sheets) - 1
+                    return input.tables_to_input(shifts, tasks)
+                parsed, parse_seconds = timed(parse)
+                assert parsed == expected
+                print(f"{rows:>7} {'read_tables/' + engine:>17} {read_seconds:>7.2f} {parse_seconds:>8.2f}")
+
+
+def bench_formats(sizes=(1000, 10000, 100000)):
+    """Loading the same week from xlsx, CSV and Parquet into main_process input.
+
+    parquet/dicts is the Parquet load followed by the dict form the solver
+    used to take, for comparison with the task table read_input returns.
+    """
+    print(f"{'rows':>7} {'format':>14} {'MB':>6} {'load s':>7}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in sizes:
+            path = os.path.join(tmp_dir, f'tasks_{rows}.xlsx')
+            write_workbook(path, rows)
+            shifts, tasks = input.read_tables(path)
+            expected = cache.normalized_input(*input.tables_to_input(shifts, tasks)[::-1])
+            loads = [(f'xlsx/{engine}', os.path.getsize(path), lambda engine=engine: input.read_input(path, 'xlsx', engine))
+                     for engine in dict.fromkeys(['openpyxl', input.excel_engine()])]
+            for file_format in ('csv', 'parquet'):
+                directory = os.path.join(tmp_dir, f'{file_format}_{rows}')
+                input.write_tables(shifts, tasks, directory, file_format)
+                size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+                loads.append((file_format, size, lambda directory=directory, file_format=file_format:
+                              input.read_input(directory, file_format)))
+            loads.append(('parquet/dicts', size, lambda directory=directory:
+                          input.tables_to_input(*input.read_table_files(directory, 'parquet'))))
+            for name, size, load in loads:
+                loaded, seconds = timed(load)
+                assert cache.normalized_input(*loaded[::-1]) == expected
+                print(f"{rows:>7} {name:>14} {size / 1e6:>6.2f} {seconds:>7.2f}")
+
+
+def edited_week(tasks, day='2'):
+    #The week with one more nurse on the first task of one day
+    tasks = {key: [dict(task) for task in items] for key, items in tasks.items()}
+    tasks[day][0]['nurses_required'] += 1
+    return tasks
+
+
+def bench_incremental(sizes=(10,)):
+    """Check: re-solving only the edited day group gives the cost of a full re-solve and keeps the other days' schedules, and how much faster it is."""
+    options = {'msg': False}
+    print(f"{'week':>14} {'templates':>9} {'groups':>6} {'resolved':>8} {'full cost':>10} {'incr cost':>10} "
+          f"{'full s':>7} {'incr s':>7}")
+    for name, tasks, shifts in sample_weeks(sizes):
+        for templates, week_shifts in (('shared', shifts), ('per-day', per_day_shifts(shifts))):
+            result, _, info = main.main_process(tasks, week_shifts, decompose=True, aggregate=True,
+                                                solver_options=options, return_info=True)
+            edited = edited_week(tasks)
+            (_, full_cost), full_seconds = timed(main.main_process, edited, week_shifts, decompose=True,
+                                                 aggregate=True, solver_options=options)
+            (new_result, cost, new_info), seconds = timed(main.main_process, edited, week_shifts, aggregate=True,
+                                                          previous=info, solver_options=options, return_info=True)
+            print(f"{name:>14} {templates:>9} {new_info['subproblems']:>6} {new_info['resolved']:>8} {full_cost:>10.2f} "
+                  f"{cost:>10.2f} {full_seconds:>7.2f} {seconds:>7.2f}")
+            if abs(cost - full_cost) > 1e-6 * max(1.0, abs(full_cost)):
+                raise SystemExit(f"incremental cost {cost} differs from the full re-solve {full_cost}")
+            #The days of the groups that were not re-solved keep the previous schedule
+            previous_keys = {group['key'] for group in info['groups']}
+            kept = {int(day) for group in new_info['groups'] if group['key'] in previous_keys
+                    for day, _ in group['task_keys']}
+            changed = sorted(day for day in kept if new_result[day] != result[day])
+            if changed:
+                raise SystemExit(f"incremental run changed the schedule of unedited days {changed}")
+
+
+def bench_heuristic(sizes=(10, 20, 40)):
+    """Quick heuristic vs the MIP (CBC, event grid, 120 s limit): cost, gap and time, and the MIP with the heuristic as start."""
+    print(f"{'week':>14} {'quick cost':>10} {'quick ms':>8} {'MIP cost':>10} {'gap':>6} {'MIP s':>6} {'MIP+start s':>11}")
+    options = {'msg': False, 'time_limit': 120}
+    for name, tasks, shifts in sample_weeks(sizes):
+        (_, quick_cost), quick_seconds = timed(main.main_process, tasks, shifts, aggregate=True,
+                                              solver_options={'solver': 'quick'})
+        (_, cost), seconds = timed(main.main_process, tasks, shifts, aggregate=True, solver_options=options)
+        (_, start_cost), start_seconds = timed(main.main_process, tasks, shifts, aggregate=True,
+                                              solver_options=dict(options, heuristic_start=True))
+        print(f"{name:>14} {quick_cost:>10.2f} {quick_seconds * 1e3:>8.1f} {cost:>10.2f} "
+              f"{(quick_cost - cost) / cost:>6.1%} {seconds:>6.2f} {start_seconds:>11.2f}")
+
+
+def day_only_shifts(shifts):
+    #Drop the shift templates that start before 06:00 or run past midnight, leaving the night uncovered
+    return [shift for shift in shifts if '06:00' <= shift['start_time'] < shift['end_time']]
+
+
+def bench_precheck(sizes=(10, 40, 100)):
+    """Precheck time and lower bound vs the MIP (CBC, event grid, 60 s limit), and how fast an input with uncovered night tasks fails with and without it."""
+    options = {'msg': False, 'time_limit': 60}
+    print(f"{'week':>14} {'check ms':>8} {'bound':>10} {'MIP cost':>10} {'bound gap':>9} "
+          f"{'problems':>8} {'fail ms':>8} {'unchecked fail s':>16}")
+    for name, tasks, shifts in sample_weeks(sizes):
+        check, seconds = timed(main.precheck, tasks, shifts)
+        (_, cost), _ = timed(main.main_process, tasks, shifts, aggregate=True, solver_options=options)
+        night = day_only_shifts(shifts)
+        broken, broken_seconds = timed(main.precheck, tasks, night)
+        start = time.perf_counter()
+        try:
+            main.main_process(tasks, night, aggregate=True, solver_options=options, check_input=False)
+        except (RuntimeError, IndexError):
+            pass
+        unchecked = time.perf_counter() - start
+        print(f"{name:>14} {seconds * 1e3:>8.1f} {check['lower_bound']:>10.2f} {cost:>10.2f} "
+              f"{(cost - check['lower_bound']) / cost:>9.1%} {len(broken['problems']):>8} "
+              f"{broken_seconds * 1e3:>8.1f} {unchecked:>16.2f}")
+
+
+def legacy_sheet_html(sheet):
+    #app.generate_html_table_with_merge before sheet_html: a scan of every merged range per cell of the loaded sheet
+    merged_cells = sheet.merged_cells.ranges
+    merged_map = {(r.min_row, r.min_col): (r.max_row, r.max_col) for r in merged_cells}
+    def color(cell):
+        fill = cell.fill
+        if fill is None or fill.fill_type is None:
+            return "#FFFFFF"
+        return f"#{fill.fgColor.rgb[2:]}"
+    table_html = "<table style='border-collapse:collapse; width:100%;'>"
+    for row in sheet.iter_rows():
+        table_html += "<tr>"
+        for col_index, cell in enumerate(row):
+            cell_ref = f"{get_column_letter(cell.column)}{cell.row}"
+            column_style = "min-width: 75px; font-weight: bold;" if col_index == 0 else ""
+            if (cell.row, cell.column) in merged_map:
+                max_row, max_col = merged_map[(cell.row, cell.column)]
+                table_html += (
+                    f'<td style="background-color:{color(cell)}; padding:4px; border:1px solid #ccc; {column_style}" '
+                    f'rowspan="{max_row - cell.row + 1}" colspan="{max_col - cell.column + 1}">{cell.value or ""}</td>')
+            elif not any(cell_ref in merge_range for merge_range in merged_cells):
+                table_html += (f'<td style="background-color:{color(cell)}; padding:4px; border:1px solid #ccc; '
+                               f'{column_style}">{cell.value or ""}</td>')
+        table_html += "</tr>"
+    return table_html + "</table>"
+
+
+def quick_schedule(tasks, shifts):
+    return main.main_process(tasks, shifts, aggregate=True, solver_options={'solver': 'quick'})[0]
+
+
+def bench_preview(sizes=(10, 40)):
+    """Nurse schedule preview of every sheet: openpyxl round trip and merged-range scans vs sheet_html from the layouts."""
+    print(f"{'week':>14} {'sheets':>6} {'merges':>7} {'legacy s':>8} {'new s':>7} {'speedup':>7}")
+    for name, tasks, shifts in sample_weeks(sizes):
+        schedule = quick_schedule(tasks, shifts)
+        #The openpyxl workbook the legacy preview read (xlsxwriter writes 1-cell blocks without a merge)
+        workbook_bytes = legacy_shift_xlsx(app.shift_sheet_layouts(schedule))
+        def legacy():
+            workbook = load_workbook(io.BytesIO(workbook_bytes))
+            return [legacy_sheet_html(workbook[sheet]) for sheet in workbook.sheetnames]
+        def new():
+            return [app.sheet_html(layout) for layout in app.shift_sheet_layouts(schedule).values()]
+        old_html, legacy_seconds = timed(legacy)
+        new_html, seconds = timed(new)
+        if old_html != new_html:
+            raise SystemExit(f"{name}: sheet_html differs from the legacy preview")
+        merges = sum(len(layout['blocks']) for layout in app.shift_sheet_layouts(schedule).values())
+        print(f"{name:>14} {len(new_html):>6} {merges:>7} {legacy_seconds:>8.2f} {seconds:>7.3f} "
+              f"{legacy_seconds / seconds:>6.0f}x")
+
+
+def legacy_find_available_rows(row_occupancy, start_time, end_time, required_rows):
+    #app.find_available_rows: probe rows 2..499 against per time unit occupancy sets
+    for row in range(2, 500):
+        if all(row + i not in row_occupancy[t] for t in range(start_time, end_time + 1) for i in range(required_rows)):
+            return row
+    return None
+
+
+def legacy_layouts(schedule, unit_minutes=main.TIME_UNIT_MINUTES):
+    #app.shift_sheet_layouts with find_available_rows, which drops the blocks it finds no rows for
+    day_shift_data = defaultdict(lambda: defaultdict(lambda: defaultdict(dict)))
+    task_nurses_count = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+    for day, tasks in schedule.items():
+        for task_id, (time_blocks, nurses_list) in tasks.items():
+            for t, nurses in zip(time_blocks, nurses_list):
+                for shift_id, count in Counter(nurses).items():
+                    day_shift_data[day][shift_id][t % main.units_per_day(unit_minutes)][task_id] = count
+                    task_nurses_count[day][shift_id][task_id] = max(task_nurses_count[day][shift_id][task_id], count)
+    layouts = {}
+    for day in day_shift_data:
+        for shift_id, shift_data in day_shift_data[day].items():
+            first_block, last_block = min(shift_data), max(shift_data)
+            blocks, row_occupancy = [], defaultdict(set)
+            for t in range(first_block, last_block + 1):
+                for task_id in shift_data[t]:
+                    if t == first_block or task_id not in shift_data[t - 1]:
+                        merge_end = t
+                        while merge_end + 1 <= last_block and task_id in shift_data[merge_end + 1]:
+                            merge_end += 1
+                        required_rows = task_nurses_count[day][shift_id][task_id]
+                        start_row = legacy_find_available_rows(row_occupancy, t, merge_end, required_rows)
+                        if start_row is None:
+                            continue
+                        for t_block in range(t, merge_end + 1):
+                            row_occupancy[t_block].update(range(start_row, start_row + required_rows))
+                        blocks.append((task_id, t, merge_end, start_row, required_rows))
+            layouts[f"day_{day}_shift_{shift_id}"] = blocks
+    return layouts
+
+
+def crowded_schedule(n_tasks, max_nurses, shifts=2, seed=0):
+    #One day of n_tasks tasks of 1 to 8 hours, each with up to max_nurses nurses of one of the shifts
+    rng = random.Random(seed)
+    tasks = {}
+    for task_id in range(n_tasks):
+        start = rng.randrange(0, 64)
+        blocks = list(range(start, start + rng.randrange(4, 33)))
+        tasks[task_id] = [blocks, [[task_id % shifts] * rng.randint(1, max_nurses)] * len(blocks)]
+    return {0: tasks}
+
+
+def bench_rows(sizes=(100, 400, 1000)):
+    """Row packing of the nurse schedule sheets: linear row probing (500 row cap) vs the end-time heap.
+
+    Rows are the nurse rows of the busiest sheet; no packing needs fewer than the peak number of
+    nurses on one shift at once. Dropped counts the task blocks the capped probe left out.
+    """
+    print(f"{'tasks':>6} {'peak':>5} {'legacy rows':>11} {'dropped':>7} {'legacy s':>8} {'heap rows':>9} {'heap s':>7}")
+    for n in sizes:
+        schedule = crowded_schedule(n, 12)
+        peak = Counter()
+        for blocks, nurses in schedule[0].values():
+            for t in blocks:
+                peak[(t, nurses[0][0])] += len(nurses[0])
+        old, legacy_seconds = timed(legacy_layouts, schedule)
+        new, seconds = timed(app.shift_sheet_layouts, schedule)
+        old_rows = max(start + rows - 2 for blocks in old.values() for _, _, _, start, rows in blocks)
+        dropped = sum(len(layout['blocks']) for layout in new.values()) - sum(len(blocks) for blocks in old.values())
+        if not dropped and any(old[name] != layout['blocks'] for name, layout in new.items()):
+            raise SystemExit(f"{n} tasks: the heap packing differs from the row probing")
+        print(f"{n:>6} {max(peak.values()):>5} {old_rows:>11} {dropped:>7} {legacy_seconds:>8.2f} "
+              f"{max(layout['rows'] for layout in new.values()) - 1:>9} {seconds:>7.3f}")
+
+
+def legacy_gantt_xlsx(schedule_data, unit_minutes=main.TIME_UNIT_MINUTES):
+    #app.create_excel_gantt_xlsx before xlsxwriter: a full openpyxl workbook with a new PatternFill per cell
+    wb = Workbook()
+    used_default_sheet = False
+
+    day_keys_sorted = sorted(schedule_data.keys(), key=app.convert_day_key_to_int)
+    if not day_keys_sorted:
+        return b""
+
+    for day_key in day_keys_sorted:
+        day_index = app.convert_day_key_to_int(day_key)
+
+        sheet_name = f"Day{day_index}"
+        if not used_default_sheet:
+            ws = wb.active
+            ws.title = sheet_name
+            used_default_sheet = True
+        else:
+            ws = wb.create_sheet(title=sheet_name)
+
+        jobs_dict = schedule_data[day_key]
+        all_blocks = []
+        for task_data in jobs_dict.values():
+            if len(task_data) >= 1 and task_data[0]:
+                all_blocks.extend(task_data[0])
+
+        if not all_blocks:
+            continue
+
+        min_block = min(all_blocks)
+        max_block = max(all_blocks)
+
+        # Row 1: time labels
+        for col_i, block in enumerate(range(min_block, max_block + 1), start=2):
+            minute_offset = block * unit_minutes
+            hh = minute_offset // 60
+            mm = minute_offset % 60
+            time_label = f"{hh:02d}:{mm:02d}"
+            cell = ws.cell(row=1, column=col_i)
+            cell.value = time_label
+            cell.alignment = Alignment(horizontal="center", vertical="center")
+
+        row_i = 2
+        sorted_job_items = sorted(jobs_dict.items(), key=lambda x: app.convert_day_key_to_int(x[0]))
+        for task_key, val in sorted_job_items:
+            ws.cell(row=row_i, column=1).value = f"Task {task_key}"
+            ws.cell(row=row_i, column=1).alignment = Alignment(horizontal="left")
+
+            if len(val) < 1:
+                row_i += 1
+                continue
+
+            time_slots = val[0]
+            for block in time_slots:
+                col_i = (block - min_block) + 2
+                fill = PatternFill("solid", fgColor=app.color_for_task(task_key))
+                ws.cell(row=row_i, column=col_i).fill = fill
+
+            row_i += 1
+
+        ws.freeze_panes = "B2"
+
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def legacy_shift_xlsx(layouts, unit_minutes=main.TIME_UNIT_MINUTES):
+    #app.create_shift_based_excel before xlsxwriter: a full openpyxl workbook, styled cell by cell
+    thin_border = Border(left=Side(style='thin'),
+                         right=Side(style='thin'),
+                         top=Side(style='thin'),
+                         bottom=Side(style='thin'))
+
+    wb = Workbook()
+    if 'Sheet' in wb.sheetnames:
+        del wb['Sheet']
+
+    for sheet_name, layout in layouts.items():
+        ws = wb.create_sheet(title=sheet_name)
+        shift_start_block = layout["first_block"]
+        for col in range(shift_start_block, layout["last_block"] + 1):
+            time_str = f"{col * unit_minutes // 60:02d}:{col * unit_minutes % 60:02d}"
+            cell = ws.cell(1, col - shift_start_block + 2, time_str)
+            cell.alignment = Alignment(horizontal='center')
+            ws.column_dimensions[get_column_letter(col - shift_start_block + 2)].width = 7
+
+        for task_id, merge_start, merge_end, start_row, required_rows in layout["blocks"]:
+            end_row = start_row + required_rows - 1
+            cell = ws.cell(row=start_row, column=merge_start - shift_start_block + 2)
+            cell.value = f"Task {task_id}\nNurses: {required_rows}"
+            cell.alignment = Alignment(wrapText=True, horizontal='center', vertical='center')
+            cell.fill = PatternFill("solid", fgColor=app.color_for_task(str(task_id)))
+
+            ws.merge_cells(start_row=start_row, end_row=end_row,
+                           start_column=merge_start - shift_start_block + 2,
+                           end_column=merge_end - shift_start_block + 2)
+
+            for r in range(start_row, end_row + 1):
+                for c in range(merge_start, merge_end + 1):
+                    ws.cell(r, c - shift_start_block + 2).border = thin_border
+
+        for row in range(2, layout["rows"] + 1):
+            ws.cell(row, 1, f"Nurse {row - 1}")
+            ws.cell(row, 1).alignment = Alignment(horizontal='right')
+
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def workbook_summary(data):
+    #Sheet names, and per sheet its values, fill colors and merged ranges larger than one cell
+    workbook = load_workbook(io.BytesIO(data))
+    summary = {}
+    for ws in workbook:
+        values = {(c.row, c.column): c.value for row in ws.iter_rows() for c in row if c.value is not None}
+        fills = {(c.row, c.column): c.fill.fgColor.rgb[-6:] for row in ws.iter_rows() for c in row
+                 if c.fill is not None and c.fill.fill_type == 'solid'}
+        merges = {str(r) for r in ws.merged_cells.ranges if r.size['rows'] * r.size['columns'] > 1}
+        summary[ws.title] = (values, fills, merges)
+    return summary
+
+
+def bench_export(sizes=(10, 40, 100)):
+    """Excel exports: openpyxl workbooks styled cell by cell vs xlsxwriter with shared formats. Time and peak traced memory."""
+    print(f"{'week':>14} {'export':>6} {'legacy s':>8} {'new s':>7} {'legacy MB':>9} {'new MB':>7}")
+    for name, tasks, shifts in sample_weeks(sizes):
+        schedule = quick_schedule(tasks, shifts)
+        layouts = app.shift_sheet_layouts(schedule)
+        for export, legacy, new in (('gantt', lambda: legacy_gantt_xlsx(schedule), lambda: app.create_excel_gantt_xlsx(schedule)),
+                                    ('nurses', lambda: legacy_shift_xlsx(layouts),
+                                     lambda: app.create_shift_based_excel(schedule, layouts=layouts))):
+            old_data, legacy_seconds = timed(legacy)
+            new_data, seconds = timed(new)
+            if workbook_summary(old_data) != workbook_summary(new_data):
+                raise SystemExit(f"{name}: the {export} export differs from the openpyxl one")
+            print(f"{name:>14} {export:>6} {legacy_seconds:>8.2f} {seconds:>7.2f} "
+                  f"{traced(legacy) / 2**20:>9.1f} {traced(new) / 2**20:>7.1f}")
+
+
+def bench_artifacts(sizes=(10, 40, 100)):
+    """Work after a solve before the cost shows: every view and export (as before) vs the schedule hash only.
+
+    The Gantt figure (first tab) then follows on its own, the exports only once they are downloaded.
+    """
+    print(f"{'week':>14} {'eager s':>7} {'hash ms':>7} {'figure s':>8} {'exports s':>9}")
+    for name, tasks, shifts in sample_weeks(sizes):
+        schedule = quick_schedule(tasks, shifts)
+        def eager():
+            layouts = app.shift_sheet_layouts(schedule)
+            app.create_excel_gantt_xlsx(schedule)
+            app.create_shift_based_excel(schedule, layouts=layouts)
+            app.sheet_html(next(iter(layouts.values())))
+            app.gantt_figure(app.gantt_frame(schedule))
+        _, eager_seconds = timed(eager)
+        _, hash_seconds = timed(app.schedule_hash, schedule, main.TIME_UNIT_MINUTES)
+        _, figure_seconds = timed(lambda: app.gantt_figure(app.gantt_frame(schedule)))
+        _, export_seconds = timed(lambda: (app.create_excel_gantt_xlsx(schedule), app.create_shift_based_excel(schedule)))
+        print(f"{name:>14} {eager_seconds:>7.2f} {hash_seconds * 1e3:>7.1f} {figure_seconds:>8.2f} {export_seconds:>9.2f}")
+
+
+def legacy_gantt_figure(schedule_data, unit_minutes=main.TIME_UNIT_MINUTES):
+    #app.gantt_figure before the WebGL chart: px.timeline with one row per task, colored by its nurse list
+    gantt_data = []
+    for day_key, jobs_dict in schedule_data.items():
+        base_day = datetime.datetime(2025, 1, 1) + datetime.timedelta(days=app.convert_day_key_to_int(day_key))
+        for task_id, val in jobs_dict.items():
+            if len(val) < 2 or not val[0]:
+                continue
+            gantt_data.append({
+                "Task": f"Day{day_key}_Job{task_id}",
+                "Start": base_day + datetime.timedelta(minutes=min(val[0]) * unit_minutes),
+                "Finish": base_day + datetime.timedelta(minutes=(max(val[0]) + 1) * unit_minutes),
+                "Resource": str(val[1])[:30]
+            })
+    fig = px.timeline(pd.DataFrame(gantt_data), x_start="Start", x_end="Finish", y="Task", color="Resource")
+    fig.update_yaxes(autorange="reversed")
+    return fig
+
+
+def busy_week(tasks_per_week, max_nurses=4, shifts=6, seed=0):
+    #A week of tasks spread evenly over 7 days, each with its nurses from one or two of the shifts
+    rng = random.Random(seed)
+    week = {}
+    for task_id in range(tasks_per_week):
+        start = rng.randrange(0, 80)
+        blocks = list(range(start, start + rng.randrange(2, 17)))
+        shift = rng.randrange(shifts)
+        nurses = [shift] * rng.randint(1, max_nurses) + [(shift + 1) % shifts] * rng.randint(0, 1)
+        week.setdefault(task_id % 7, {})[task_id] = [blocks, [nurses] * len(blocks)]
+    return week
+
+
+def bench_gantt(sizes=(500, 2000, 5000)):
+    """Gantt chart of a week of n tasks: px.timeline with a row per task vs packed WebGL lanes.
+
+    Build is the figure in Python, JSON what goes to the browser (its size
+    roughly tracks the render time there).
+    """
+    print(f"{'tasks':>6} {'chart':>8} {'traces':>6} {'rows':>5} {'bars':>5} {'build s':>7} {'json s':>6} {'json MB':>7}")
+    for n in sizes:
+        schedule = busy_week(n)
+        charts = [('legacy', lambda: (legacy_gantt_figure(schedule), {'rows': n, 'bars': n})),
+                  ('webgl', lambda: app.gantt_figure(app.gantt_frame(schedule)))]
+        for chart, build in charts:
+            (fig, stats), build_seconds = timed(build)
+            payload, json_seconds = timed(fig.to_json)
+            print(f"{n:>6} {chart:>8} {len(fig.data):>6} {stats['rows']:>5} {stats['bars']:>5} "
+                  f"{build_seconds:>7.2f} {json_seconds:>6.2f} {len(payload) / 2**20:>7.2f}")
+
+
+BENCHMARKS = {
+    'sparse': bench_sparse,
+    'build': bench_build,
+    'backends': bench_backends,
+    'threads': bench_threads,
+    'decompose': bench_decompose,
+    'aggregate': bench_aggregate,
+    'resolution': bench_resolution,
+    'concurrency': bench_concurrency,
+    'masks': bench_masks,
+    'extract': bench_extract,
+    'assign': bench_assign,
+    'results': bench_results,
+    'ingest': bench_ingest,
+    'formats': bench_formats,
+    'incremental': bench_incremental,
+    'heuristic': bench_heuristic,
+    'precheck': bench_precheck,
+    'preview': bench_preview,
+    'rows': bench_rows,
+    'export': bench_export,
+    'artifacts': bench_artifacts,
+    'gantt': bench_gantt,
+}
+
+if __name__ == "__main__":
+    name = sys.argv[1] if len(sys.argv) > 1 else 'sparse'
+    sizes = [int(n) for n in sys.argv[2:]]
+    if sizes:
+        BENCHMARKS[name](sizes)
+    else:
+        BENCHMARKS[name]()
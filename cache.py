@@ -0,0 +1,99 @@
+import os
+import json
+import time
+import zlib
+import pickle
+import sqlite3
+import hashlib
+from contextlib import closing
+import main
+
+#Bump when a change to main.py changes the schedules it returns, so old entries stop matching
+CACHE_VERSION = 3
+DEFAULT_CACHE_PATH = os.environ.get('SCHEDULE_CACHE',
+                                    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.schedule_cache.sqlite'))
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_BYTES = 256 * 2**20
+
+#main_process arguments that do not change the schedule it returns
+IGNORED_OPTIONS = ('msg', 'warm_start', 'heuristic_start')
+
+
+def normalized_input(input_tasks, input_scheduled_shifts):
+    #Only the fields the model reads, with their types fixed; task and shift order are kept (they number j and i).
+    #Tasks go through main.task_arrays, so a task table and its dict form get the same key
+    arrays = main.task_arrays(input_tasks)
+    tasks = [arrays['days']] + [arrays[key].tolist() for key in ('day', 'start', 'end', 'duration', 'nurses')]
+    shifts = [[str(shift['start_time'])[:5], str(shift['end_time'])[:5], str(shift['break_time']),
+               int(shift['break_duration']), float(shift['cost']), str(shift['days']).replace(' ', '')]
+              for shift in input_scheduled_shifts]
+    return tasks, shifts
+
+
+def cache_key(input_tasks, input_scheduled_shifts, **kwargs):
+    """SHA-256 of the normalized tasks and shifts and the main_process arguments."""
+    kwargs = dict(kwargs)
+    options = dict(main.DEFAULT_SOLVER_OPTIONS, **(kwargs.pop('solver_options', None) or {}))
+    kwargs['solver_options'] = {key: value for key, value in options.items() if key not in IGNORED_OPTIONS}
+    kwargs.setdefault('unit_minutes', main.TIME_UNIT_MINUTES)
+    for key in ('initial_solution', 'return_info', 'max_workers', 'previous', 'progress', 'stop'):
+        kwargs.pop(key, None)
+    payload = [CACHE_VERSION, normalized_input(input_tasks, input_scheduled_shifts), kwargs]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=60)
+    connection.execute('CREATE TABLE IF NOT EXISTS entries '
+                       '(key TEXT PRIMARY KEY, value BLOB, size INTEGER, last_used REAL)')
+    return connection
+
+
+def cache_get(path, key):
+    """The (result, cost, info) stored under key, or None. A hit marks the entry as recently used."""
+    if not os.path.exists(path):
+        return None
+    with closing(connect(path)) as connection, connection:
+        row = connection.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        connection.execute('UPDATE entries SET last_used = ? WHERE key = ?', (time.time(), key))
+    return pickle.loads(zlib.decompress(row[0]))
+
+
+def cache_put(path, key, value, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+    """Store value under key, then drop least recently used entries beyond max_entries or max_bytes."""
+    blob = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    with closing(connect(path)) as connection, connection:
+        connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)', (key, blob, len(blob), time.time()))
+        kept, total = 0, 0
+        for row_key, size in connection.execute('SELECT key, size FROM entries ORDER BY last_used DESC').fetchall():
+            kept, total = kept + 1, total + size
+            if kept > max_entries or (total > max_bytes and kept > 1):
+                connection.execute('DELETE FROM entries WHERE key = ?', (row_key,))
+
+
+def cache_clear(path=DEFAULT_CACHE_PATH):
+    if os.path.exists(path):
+        with closing(connect(path)) as connection, connection:
+            connection.execute('DELETE FROM entries')
+
+
+def cached_main_process(input_tasks, input_scheduled_shifts, cache_path=DEFAULT_CACHE_PATH,
+                        max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, **kwargs):
+    """main.main_process behind the on-disk cache at cache_path.
+
+    Always returns (result, cost, info); info['cache_hit'] tells whether the
+    schedule came from the cache. Failed solves and solves ended early with
+    stop are not stored.
+    """
+    key = cache_key(input_tasks, input_scheduled_shifts, **kwargs)
+    value = cache_get(cache_path, key)
+    if value is not None:
+        result, cost, info = value
+        return result, cost, dict(info, cache_hit=True)
+    kwargs['return_info'] = True
+    result, cost, info = main.main_process(input_tasks, input_scheduled_shifts, **kwargs)
+    if not info.get('stopped'):
+        cache_put(cache_path, key, (result, cost, info), max_entries, max_bytes)
+    return result, cost, dict(info, cache_hit=False)
@@ -11,6 +11,14 @@ end_time = datetime(2025, 1, 16, 23, 0)
 
 end_of_day = datetime.strptime("23:59", "%H:%M")
 
+SCHEDULED_SHIFTS = [
+    {'start_time': '00:00', 'end_time': '12:45', 'break_time': '11:30', 'break_duration': 30, 'cost': 116.19,'days':'1,2,3,4,5'},
+    {'start_time': '08:45', 'end_time': '18:45', 'break_time': '09:00', 'break_duration': 30, 'cost': 327.08,'days':'1,2,3,4,5'},
+    {'start_time': '16:00', 'end_time': '23:59', 'break_time': '18:00', 'break_duration': 30, 'cost': 437.58,'days':'1,2,3,4,5'},
+    {'start_time': '00:00', 'end_time': '06:45', 'break_time': '06:00', 'break_duration': 30, 'cost': 219.00,'days':'0,6'},
+    {'start_time': '06:00', 'end_time': '18:45', 'break_time': '15:00', 'break_duration': 30, 'cost': 327.08,'days':'0,6'},
+    {'start_time': '15:00', 'end_time': '23:59', 'break_time': '18:00', 'break_duration': 30, 'cost': 355.58,'days':'0,6'}]
+
 def random_time(start, end):
     fmt = "%H:%M"
     start_dt = datetime.strptime(start, fmt)
@@ -52,6 +60,11 @@ def generate_scheduled_tasks(n):
         tasks.append(task)
     return tasks
 
+def generate_week(num_tasks):
+    """Random week in the (tasks_dict, shifts_list) shape main.main_process expects."""
+    tasks = {str(day): generate_scheduled_tasks(num_tasks) for day in range(7)}
+    return tasks, [dict(shift) for shift in SCHEDULED_SHIFTS]
+
 
 def main(length):
 
@@ -60,13 +73,7 @@ def main(length):
     num_tasks = length
     num_shifts = 3
     scheduled_tasks = generate_scheduled_tasks(num_tasks)
-    scheduled_shifts = [
-    {'start_time': '00:00', 'end_time': '12:45', 'break_time': '11:30', 'break_duration': 30, 'cost': 116.19,'days':'1,2,3,4,5'},
-    {'start_time': '08:45', 'end_time': '18:45', 'break_time': '09:00', 'break_duration': 30, 'cost': 327.08,'days':'1,2,3,4,5'},
-    {'start_time': '16:00', 'end_time': '23:59', 'break_time': '18:00', 'break_duration': 30, 'cost': 437.58,'days':'1,2,3,4,5'},
-    {'start_time': '00:00', 'end_time': '06:45', 'break_time': '06:00', 'break_duration': 30, 'cost': 219.00,'days':'0,6'},
-    {'start_time': '06:00', 'end_time': '18:45', 'break_time': '15:00', 'break_duration': 30, 'cost': 327.08,'days':'0,6'},
-    {'start_time': '15:00', 'end_time': '23:59', 'break_time': '18:00', 'break_duration': 30, 'cost': 355.58,'days':'0,6'}]
+    scheduled_shifts = SCHEDULED_SHIFTS
 
     week_list = []
     for i in range(7):
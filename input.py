@@ -1,7 +1,14 @@
 import os
+import glob
+import time
+import argparse
 import main
+import cache
 import json
+import numpy as np
 import pandas as pd
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 def read_txt_file(file_name):
     with open(file_name, 'r', encoding='utf-8') as f:
@@ -11,50 +18,517 @@ def save_results_to_json(results, file_name):
     with open(file_name, 'w', encoding='utf-8') as f:
         json.dump(results, f, ensure_ascii=False, indent=4)
 
-        
-        
-def process_xlsx(file_path):
-    xls = pd.ExcelFile(file_path)
-    return_shift = {}
-    return_task = {}
-    df_first = pd.read_excel(xls, sheet_name=xls.sheet_names[0], dtype=str)
-    return_shift = [
-        {
-            'start_time': row['start_time'][:5],
-            'end_time': row['end_time'][:5],
-            'break_time': row['break_time'][:5],
-            'break_duration': int(row['break_duration']),
-            'cost': float(row['cost']),
-            'days': row['days']
-        }
-        for _, row in df_first.iterrows()
-    ]
-
-    for i in range(1, len(xls.sheet_names)):
-        df = pd.read_excel(xls, sheet_name=xls.sheet_names[i], dtype=str)
-        return_task[str(i-1)] = [
-            {
-                'start_time': row['start_time'][:5],
-                'end_time': row['end_time'][:5],
-                'duration': row['duration'][:5],
-                'nurses_required': int(row['nurses_required'])
-            }
-            for _, row in df.iterrows()
-        ]
-
-    return return_shift,return_task
-
-def main_process_pipeline():
+def compact_result(result, cost=None, unit_minutes=main.TIME_UNIT_MINUTES):
+    """Run-length form of a main_process result.
+
+    Every task keeps its start, its length and the runs of time units with
+    the same nurses per shift: [run length, [[shift, nurses], ...]].
+    """
+    days = {}
+    for day, tasks in result.items():
+        days[str(day)] = {}
+        for task_index, (time_interval_task, nurses) in tasks.items():
+            runs = []
+            previous = None
+            for unit in nurses:
+                if unit == previous:
+                    runs[-1][0] += 1
+                    continue
+                previous = unit
+                counts = [list(pair) for pair in sorted(Counter(unit).items())]
+                if runs and runs[-1][1] == counts:
+                    runs[-1][0] += 1
+                else:
+                    runs.append([1, counts])
+            days[str(day)][str(task_index)] = {'start': time_interval_task[0], 'length': len(time_interval_task),
+                                               'shifts': runs}
+    return {'format': 'compact', 'unit_minutes': unit_minutes, 'cost': cost, 'days': days}
+
+def expand_result(compact):
+    #Back to the shape of main_process; the shift ids of a time unit come out sorted
+    result = {}
+    for day, tasks in compact['days'].items():
+        result[int(day)] = {}
+        for task_index, task in tasks.items():
+            nurses = []
+            for length, counts in task['shifts']:
+                unit = [shift for shift, count in counts for _ in range(count)]
+                nurses.extend(list(unit) for _ in range(length))
+            result[int(day)][int(task_index)] = [list(range(task['start'], task['start'] + task['length'])), nurses]
+    return result
+
+def result_arrays(compact):
+    """Columnar form of a compact result, three tables linked by offsets.
+
+    Task k has the runs run_ptr[k]:run_ptr[k+1], run r has the
+    (shift, count) pairs count_ptr[r]:count_ptr[r+1].
+    """
+    day, task, start, length, run_ptr = [], [], [], [], [0]
+    run_length, count_ptr, shift, count = [], [0], [], []
+    for day_key, tasks in compact['days'].items():
+        for task_key, item in tasks.items():
+            day.append(int(day_key))
+            task.append(int(task_key))
+            start.append(item['start'])
+            length.append(item['length'])
+            for run, counts in item['shifts']:
+                run_length.append(run)
+                for shift_id, nurses in counts:
+                    shift.append(shift_id)
+                    count.append(nurses)
+                count_ptr.append(len(shift))
+            run_ptr.append(len(run_length))
+    arrays = {'day': day, 'task': task, 'start': start, 'length': length, 'run_ptr': run_ptr,
+              'run_length': run_length, 'count_ptr': count_ptr, 'shift': shift, 'count': count}
+    arrays = {key: np.array(values, dtype=np.int32) for key, values in arrays.items()}
+    arrays['days'] = np.array([int(day) for day in compact['days']], dtype=np.int32)
+    arrays['unit_minutes'] = np.array(compact['unit_minutes'])
+    arrays['cost'] = np.array(np.nan if compact['cost'] is None else compact['cost'])
+    return arrays
+
+def arrays_to_compact(arrays):
+    run_ptr, count_ptr = arrays['run_ptr'].tolist(), arrays['count_ptr'].tolist()
+    run_length, shift, count = arrays['run_length'].tolist(), arrays['shift'].tolist(), arrays['count'].tolist()
+    cost = float(arrays['cost'])
+    #Every day of the week, the ones without tasks included (files written before 'days' only have the others)
+    days = {str(day): {} for day in arrays['days'].tolist()} if 'days' in arrays else {}
+    for k, (day, task, start, length) in enumerate(zip(arrays['day'].tolist(), arrays['task'].tolist(),
+                                                       arrays['start'].tolist(), arrays['length'].tolist())):
+        runs = [[run_length[r], [[shift[c], count[c]] for c in range(count_ptr[r], count_ptr[r+1])]]
+                for r in range(run_ptr[k], run_ptr[k+1])]
+        days.setdefault(str(day), {})[str(task)] = {'start': start, 'length': length, 'shifts': runs}
+    return {'format': 'compact', 'unit_minutes': int(arrays['unit_minutes']),
+            'cost': None if np.isnan(cost) else cost, 'days': days}
+
+RESULT_COLUMNS = ['day', 'task', 'start', 'length', 'run', 'run_length', 'shift', 'count']
+
+def result_table(compact):
+    """Flat form of a compact result for CSV and Parquet: one row per task, run and shift.
+
+    Runs without nurses keep one row with shift -1 and days without tasks
+    one row with task -1; every row repeats the unit_minutes and cost of the
+    week.
+    """
+    rows = []
+    for day, tasks in compact['days'].items():
+        if not tasks:
+            rows.append((int(day), -1, 0, 0, 0, 0, -1, 0))
+        for task, item in tasks.items():
+            for run, (run_length, counts) in enumerate(item['shifts']):
+                for shift_id, nurses in counts or [[-1, 0]]:
+                    rows.append((int(day), int(task), item['start'], item['length'], run, run_length, shift_id, nurses))
+    table = pd.DataFrame(np.array(rows, dtype=np.int64).reshape(-1, len(RESULT_COLUMNS)), columns=RESULT_COLUMNS)
+    table['unit_minutes'] = compact['unit_minutes']
+    table['cost'] = np.nan if compact['cost'] is None else compact['cost']
+    return table
+
+def table_to_compact(table):
+    days = {}
+    for day, task, start, length, run, run_length, shift_id, nurses in zip(*(table[column].tolist() for column in RESULT_COLUMNS)):
+        if task < 0:
+            days.setdefault(str(day), {})
+            continue
+        item = days.setdefault(str(day), {}).setdefault(str(task), {'start': start, 'length': length, 'shifts': []})
+        if run == len(item['shifts']):
+            item['shifts'].append([run_length, []])
+        if shift_id >= 0:
+            item['shifts'][run][1].append([shift_id, nurses])
+    cost = float(table['cost'].iloc[0]) if len(table) else np.nan
+    return {'format': 'compact', 'unit_minutes': int(table['unit_minutes'].iloc[0]) if len(table) else main.TIME_UNIT_MINUTES,
+            'cost': None if np.isnan(cost) else cost, 'days': days}
+
+def save_results(result, cost, file_name, unit_minutes=main.TIME_UNIT_MINUTES):
+    """Save a result in the compact format.
+
+    The file extension picks the encoding: .npz for NumPy arrays, .csv and
+    .parquet for the flat result_table, anything else for JSON.
+    """
+    compact = compact_result(result, cost, unit_minutes)
+    if file_name.endswith('.npz'):
+        np.savez_compressed(file_name, **result_arrays(compact))
+    elif file_name.endswith('.csv'):
+        result_table(compact).to_csv(file_name, index=False)
+    elif file_name.endswith('.parquet'):
+        result_table(compact).to_parquet(file_name, index=False)
+    else:
+        with open(file_name, 'w', encoding='utf-8') as f:
+            json.dump(compact, f, separators=(',', ':'))
+
+def result_cost(result, shifts, unit_minutes=main.TIME_UNIT_MINUTES):
+    """Cost of a main_process result: every shift template paid for the most of its nurses working at once.
+
+    That is the number of nurses the solver hires for it in an optimal
+    schedule.
+    """
+    working = [Counter() for _ in shifts]
+    for day, tasks in result.items():
+        day_start = int(day)*main.units_per_day(unit_minutes)
+        for time_units, nurses in tasks.values():
+            for unit, unit_nurses in zip(time_units, nurses):
+                for shift_id in unit_nurses:
+                    working[int(shift_id)][day_start + unit] += 1
+    return sum(float(shift['cost']) * max(counts.values(), default=0) for shift, counts in zip(shifts, working))
+
+def load_results(file_name, expand=True, shifts=None, unit_minutes=main.TIME_UNIT_MINUTES):
+    """Load a result saved by save_results (or a legacy results.json).
+
+    Returns the compact dict, or with expand=True (result, cost) in the
+    shape of main_process. Legacy files that hold only the result have no
+    cost: it is recomputed from the shift templates (see result_cost), which
+    then have to be passed as shifts, with the unit_minutes of the solve.
+    """
+    if file_name.endswith('.npz'):
+        with np.load(file_name) as arrays:
+            compact = arrays_to_compact(arrays)
+    elif file_name.endswith('.csv'):
+        compact = table_to_compact(pd.read_csv(file_name))
+    elif file_name.endswith('.parquet'):
+        compact = table_to_compact(pd.read_parquet(file_name))
+    else:
+        with open(file_name, encoding='utf-8') as f:
+            compact = json.load(f)
+        if not (isinstance(compact, dict) and compact.get('format') == 'compact'):
+            #Legacy file: [result, cost] as written by save_results_to_json, or the result alone
+            result, cost = compact if isinstance(compact, list) else (compact, None)
+            result = {int(day): {int(task): item for task, item in tasks.items()} for day, tasks in result.items()}
+            if cost is None:
+                if shifts is None:
+                    raise ValueError(f"{file_name} holds no cost; pass the shifts it was solved with to recompute it")
+                cost = result_cost(result, shifts, unit_minutes)
+            return (result, cost) if expand else compact_result(result, cost)
+    return (expand_result(compact), compact['cost']) if expand else compact
+
+SHIFT_COLUMNS = ['start_time', 'end_time', 'break_time', 'break_duration', 'cost', 'days']
+TASK_COLUMNS = ['start_time', 'end_time', 'duration', 'nurses_required']
+SHIFT_CLOCK_COLUMNS = ('start_time', 'end_time', 'break_time')
+TASK_CLOCK_COLUMNS = ('start_time', 'end_time', 'duration')
+
+def excel_engine():
+    #calamine parses big workbooks much faster when python-calamine is installed; openpyxl reads them read-only
+    try:
+        import python_calamine
+        return 'calamine'
+    except ImportError:
+        return 'openpyxl'
+
+def read_sheets(file_path, engine=None):
+    """All sheets of the workbook in one pass, as string DataFrames in sheet order."""
+    return pd.read_excel(file_path, sheet_name=None, dtype=str, engine=engine or excel_engine())
+
+def bad_rows(sheet, column, mask, problem='invalid value'):
+    rows = (np.flatnonzero(mask) + 2).tolist() #Excel/CSV row numbers: header is row 1
+    shown = ', '.join(map(str, rows[:10])) + (' ...' if len(rows) > 10 else '')
+    return ValueError(f"{sheet!r}, column {column!r}: {problem} in row(s) {shown}")
+
+def clock_column(df, sheet, column):
+    #'H:MM' or 'HH:MM' (or with ':SS') strings to minutes after midnight, checked for the whole column at once
+    parts = df[column].fillna('').astype(str).str.strip().str.extract(r'^(\d{1,2}):(\d\d)(?::\d\d)?$')
+    hours, minutes = pd.to_numeric(parts[0]), pd.to_numeric(parts[1])
+    minutes = hours*60 + minutes
+    invalid = (minutes.isna() | (parts[1].astype(float) >= 60) | (minutes > 24*60)).to_numpy()
+    if invalid.any():
+        raise bad_rows(sheet, column, invalid)
+    return minutes.to_numpy(dtype=np.int64)
+
+def clock_text(minutes):
+    #'HH:MM' strings of minutes after midnight, as the solver's dict form has them
+    minutes = pd.Series(minutes)
+    return (minutes // 60).astype(str).str.zfill(2) + ':' + (minutes % 60).astype(str).str.zfill(2)
+
+def number_column(df, sheet, column, dtype, minimum=0, maximum=None):
+    values = df[column]
+    if not pd.api.types.is_numeric_dtype(values):
+        values = pd.to_numeric(values.str.strip(), errors='coerce')
+    invalid = values.isna() | (values < minimum)
+    if maximum is not None:
+        invalid |= values > maximum
+    if dtype is np.int64:
+        invalid |= values % 1 != 0
+    invalid = invalid.to_numpy()
+    if invalid.any():
+        raise bad_rows(sheet, column, invalid)
+    return values.to_numpy(dtype=dtype)
+
+def check_columns(df, sheet, columns):
+    #A clock column may be given in minutes instead (as write_tables does for Parquet)
+    missing = [column for column in columns if column not in df.columns and column + '_minutes' not in df.columns]
+    if missing:
+        raise ValueError(f"{sheet!r} is missing column(s) {', '.join(missing)}")
+
+def add_clock_columns(table, df, sheet, columns):
+    #Every clock column in minutes (*_minutes, which main.main_process reads) and as 'HH:MM' text.
+    #Columns given in minutes are taken as they are; where the text is given too, both have to agree
+    for column in columns:
+        if column + '_minutes' in df.columns:
+            minutes = number_column(df, sheet, column + '_minutes', np.int64, maximum=24*60)
+            if column in df.columns:
+                invalid = clock_column(df, sheet, column) != minutes
+                if invalid.any():
+                    raise bad_rows(sheet, column, invalid, f'value other than {column}_minutes')
+        else:
+            minutes = clock_column(df, sheet, column)
+        table[column] = clock_text(minutes).to_numpy()
+        table[column + '_minutes'] = minutes
+    return table
+
+def shift_table(df, sheet='shift'):
+    """Validated shift table: the columns of process_xlsx plus the clock times in minutes."""
+    check_columns(df, sheet, SHIFT_COLUMNS)
+    days = df['days'].fillna('').astype(str).str.replace(' ', '', regex=False)
+    invalid = ~days.str.fullmatch(r'[0-6](,[0-6])*').to_numpy()
+    if invalid.any():
+        raise bad_rows(sheet, 'days', invalid)
+    table = pd.DataFrame({
+        'break_duration': number_column(df, sheet, 'break_duration', np.int64),
+        'cost': number_column(df, sheet, 'cost', np.float64),
+        'days': days,
+    })
+    return add_clock_columns(table, df, sheet, SHIFT_CLOCK_COLUMNS)
+
+def task_table(df, day, sheet=None):
+    """Validated task table: the columns of process_xlsx, the day and the times in minutes.
+
+    day is the day of every row, or an array with the day of each row.
+    """
+    sheet = str(day) if sheet is None else sheet
+    check_columns(df, sheet, TASK_COLUMNS)
+    table = pd.DataFrame({
+        'day': np.zeros(len(df), dtype=np.int64) + np.asarray(day, dtype=np.int64),
+        'nurses_required': number_column(df, sheet, 'nurses_required', np.int64, minimum=1),
+    })
+    return add_clock_columns(table, df, sheet, TASK_CLOCK_COLUMNS)
+
+def read_tables(file_path, engine=None):
+    """Shift and task tables of a workbook: the first sheet holds the shifts, sheet i+1 the tasks of day i."""
+    sheets = list(read_sheets(file_path, engine).items())
+    shifts = shift_table(sheets[0][1], sheets[0][0])
+    tasks = [task_table(df, day, name) for day, (name, df) in enumerate(sheets[1:])]
+    tasks = pd.concat(tasks, ignore_index=True) if tasks else task_table(pd.DataFrame(columns=TASK_COLUMNS), 0).iloc[:0]
+    tasks.attrs['days'] = len(sheets) - 1
+    return shifts, tasks
+
+def tables_to_input(shifts, tasks):
+    """The (shifts, tasks) dicts main.main_process takes, from read_tables."""
+    return_shift = shifts[SHIFT_COLUMNS].to_dict('records')
+    days = tasks.attrs.get('days', int(tasks['day'].max()) + 1 if len(tasks) else 0)
+    grouped = dict(iter(tasks.groupby('day', sort=True)))
+    return_task = {str(day): grouped[day][TASK_COLUMNS].to_dict('records') if day in grouped else []
+                   for day in range(days)}
+    return return_shift, return_task
+
+def solver_input(shifts, tasks):
+    """The (shifts, tasks) main.main_process takes straight from the tables of read_tables.
+
+    The shifts become records that keep their *_minutes; the task table is
+    passed as it is, and the solver reads its day, nurses_required and
+    *_minutes columns as arrays (see main.task_arrays).
+    """
+    return shifts.to_dict('records'), tasks
+
+def process_xlsx(file_path, engine=None):
+    return tables_to_input(*read_tables(file_path, engine))
+
+TABLE_FORMATS = ('xlsx', 'csv', 'parquet')
+
+def write_tables(shifts, tasks, directory, file_format='parquet'):
+    """Write shift and task tables as shifts.<format> and tasks.<format> (with a day column) in directory.
+
+    Every clock column is written once: as 'HH:MM' text in CSV, which is
+    edited by hand, and as integer *_minutes in Parquet, which the solver
+    reads without parsing.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name, table, columns, clocks in (('shifts', shifts, SHIFT_COLUMNS, SHIFT_CLOCK_COLUMNS),
+                                         ('tasks', tasks, ['day'] + TASK_COLUMNS, TASK_CLOCK_COLUMNS)):
+        if file_format != 'csv':
+            columns = [column + '_minutes' if column in clocks else column for column in columns]
+        table = table[columns]
+        path = os.path.join(directory, f'{name}.{file_format}')
+        if file_format == 'csv':
+            table.to_csv(path, index=False)
+        else:
+            table.to_parquet(path, index=False)
+
+def read_table_files(directory, file_format='parquet'):
+    """Shift and task tables written by write_tables, validated like read_tables.
+
+    The clock times come from the *_minutes columns when the files have
+    them (checked against the text where both are given). Parquet keeps
+    those and the other numeric columns typed, so they reach the solver's
+    arrays without going through strings or dicts.
+    """
+    paths = [os.path.join(directory, f'{name}.{file_format}') for name in ('shifts', 'tasks')]
+    if file_format == 'csv':
+        shifts, tasks = (pd.read_csv(path, dtype=str) for path in paths)
+    else:
+        shifts, tasks = (pd.read_parquet(path) for path in paths)
+    shifts = shift_table(shifts, paths[0])
+    check_columns(tasks, paths[1], ['day'])
+    tasks = task_table(tasks, number_column(tasks, paths[1], 'day', np.int64), paths[1])
+    tasks.attrs['days'] = int(tasks['day'].max()) + 1 if len(tasks) else 0
+    return shifts, tasks
+
+def read_input(path, input_format='xlsx', engine=None):
+    """(shifts, tasks) for main.main_process from a workbook or a write_tables directory.
+
+    The tasks stay a task table (see solver_input); process_xlsx gives the
+    dict form.
+    """
+    if input_format == 'xlsx':
+        return solver_input(*read_tables(path, engine))
+    return solver_input(*read_table_files(path, input_format))
+
+RESULT_FILES = {'compact': 'results.json', 'npz': 'results.npz', 'csv': 'results.csv',
+                'parquet': 'results.parquet', 'legacy': 'results.json'}
+
+def main_process_pipeline(unit_minutes=main.TIME_UNIT_MINUTES, result_format='compact', input_format='xlsx', input_path=None,
+                          cache_path=cache.DEFAULT_CACHE_PATH):
     current_dir = os.path.dirname(os.path.abspath(__file__))
-    input_file = os.path.join(current_dir, 'random_generate_sheet_dataframe.xlsx')
-    result_file_path = os.path.join(current_dir, 'results.json')
+    input_file = input_path or os.path.join(current_dir, 'random_generate_sheet_dataframe' + ('.xlsx' if input_format == 'xlsx' else ''))
+    result_file_path = os.path.join(current_dir, RESULT_FILES[result_format])
     
-    shift,task = process_xlsx(input_file)
+    shift,task = read_input(input_file, input_format)
     
-    result = main.main_process(task, shift)
+    result, cost = solve(task, shift, cache_path, aggregate=True, unit_minutes=unit_minutes)[:2]
     
-    save_results_to_json(result, result_file_path)
+    write_result(result, cost, result_file_path, result_format, unit_minutes)
     print("reslut save in:", result_file_path)
 
+def solve(task, shift, cache_path, **kwargs):
+    #(result, cost, info) through the solve cache, or straight from main_process when cache_path is None
+    if cache_path is None:
+        return main.main_process(task, shift, return_info=True, **kwargs)
+    return cache.cached_main_process(task, shift, cache_path, **kwargs)
+
+def write_result(result, cost, file_name, result_format='compact', unit_minutes=main.TIME_UNIT_MINUTES):
+    if result_format == 'legacy':
+        save_results_to_json((result, cost), file_name)
+    else:
+        save_results(result, cost, file_name, unit_minutes)
+
+def input_format_of(path):
+    #xlsx for workbooks, csv or parquet for write_tables directories
+    if os.path.isdir(path):
+        for file_format in ('parquet', 'csv'):
+            if os.path.exists(os.path.join(path, f'shifts.{file_format}')):
+                return file_format
+        return None
+    return 'xlsx' if path.endswith('.xlsx') else None
+
+def ward_inputs(sources):
+    """(ward, path, format) for every input among the sources.
+
+    A source is a workbook or table directory, a glob pattern, a directory
+    of those, or a manifest .txt listing one path per line (relative to the
+    manifest).
+    """
+    paths = []
+    for source in sources:
+        if source.endswith('.txt') and os.path.isfile(source):
+            with open(source, encoding='utf-8') as f:
+                lines = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+            paths.extend(os.path.join(os.path.dirname(source), line) for line in lines)
+        elif os.path.isdir(source) and input_format_of(source) is None:
+            paths.extend(sorted(os.path.join(source, name) for name in os.listdir(source)))
+        else:
+            paths.extend(sorted(glob.glob(source)) or [source])
+    wards = {}
+    for path in paths:
+        file_format = input_format_of(path)
+        if file_format is None and os.path.exists(path):
+            continue #other files next to the workbooks
+        ward = os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+        if ward in wards:
+            raise ValueError(f"Two inputs for ward {ward!r}: {wards[ward][0]} and {path}")
+        wards[ward] = (path, file_format)
+    return [(ward, path, file_format) for ward, (path, file_format) in wards.items()]
+
+def modified_time(path):
+    if os.path.isdir(path):
+        return max(os.path.getmtime(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getmtime(path)
+
+def solve_ward(ward, path, input_format, result_path, result_format, unit_minutes, solver_options, cache_path):
+    """Solve one ward for batch_process; errors become a summary row instead of an exception."""
+    start = time.perf_counter()
+    row = {'ward': ward, 'status': 'error', 'cost': None, 'seconds': None, 'cached': False, 'result': result_path,
+           'error': ''}
+    try:
+        if input_format is None:
+            raise ValueError(f"{path} is not a workbook or a shifts/tasks table directory")
+        shift, task = read_input(path, input_format)
+        result, cost, info = solve(task, shift, cache_path, aggregate=True, unit_minutes=unit_minutes,
+                                   solver_options=solver_options)
+        write_result(result, cost, result_path, result_format, unit_minutes)
+        row.update(status=info['status'], cost=cost, cached=info.get('cache_hit', False))
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+    row['seconds'] = time.perf_counter() - start
+    return row
+
+def batch_process(sources, output_dir, max_workers=None, resume=False, unit_minutes=main.TIME_UNIT_MINUTES,
+                  result_format='compact', solver_options=None, cache_path=cache.DEFAULT_CACHE_PATH):
+    """Solve every ward of the sources in a process pool, yielding one summary row per ward as it finishes.
+
+    Results go to output_dir/<ward>.<ext>. A ward that fails is reported and
+    the others continue. resume=True skips wards whose result is newer than
+    their input.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    extension = os.path.splitext(RESULT_FILES[result_format])[1]
+    solver_options = dict(solver_options or {}, msg=False)
+    jobs = []
+    for ward, path, input_format in ward_inputs(sources):
+        result_path = os.path.join(output_dir, ward + extension)
+        if (resume and os.path.exists(result_path) and os.path.exists(path)
+                and os.path.getmtime(result_path) >= modified_time(path)):
+            cost = load_results(result_path, expand=False)['cost']
+            yield {'ward': ward, 'status': 'up to date', 'cost': cost, 'seconds': 0.0, 'cached': False,
+                   'result': result_path, 'error': ''}
+            continue
+        jobs.append((ward, path, input_format, result_path, result_format, unit_minutes, solver_options, cache_path))
+    if not jobs:
+        return
+    with ProcessPoolExecutor(max_workers=max_workers or min(len(jobs), os.cpu_count() or 1)) as executor:
+        futures = [executor.submit(solve_ward, *job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+def batch_pipeline(sources, output_dir, max_workers=None, resume=False, unit_minutes=main.TIME_UNIT_MINUTES,
+                   result_format='compact', solver_options=None, cache_path=cache.DEFAULT_CACHE_PATH):
+    #Print every ward as it finishes, then the summary table (also saved as output_dir/summary.csv)
+    rows = []
+    for row in batch_process(sources, output_dir, max_workers, resume, unit_minutes, result_format, solver_options,
+                             cache_path):
+        rows.append(row)
+        cost = '' if row['cost'] is None else f"{row['cost']:.2f}"
+        cached = ' cached' if row['cached'] else ''
+        print(f"[{len(rows)}] {row['ward']}: {row['status']}{cached} {cost} ({row['seconds']:.1f} s) {row['error']}",
+              flush=True)
+    summary = pd.DataFrame(rows, columns=['ward', 'status', 'cost', 'seconds', 'cached', 'result', 'error'])
+    summary = summary.sort_values('ward', ignore_index=True)
+    summary.to_csv(os.path.join(output_dir, 'summary.csv'), index=False)
+    print(summary[['ward', 'status', 'cost', 'seconds', 'cached', 'error']].to_string(index=False))
+    return summary
+
 if __name__ == "__main__":
-    main_process_pipeline()
+    parser = argparse.ArgumentParser(description='Solve the week in the input tables and save the schedule.')
+    parser.add_argument('unit_minutes', nargs='?', type=int, default=main.TIME_UNIT_MINUTES)
+    parser.add_argument('result_format', nargs='?', default='compact', choices=list(RESULT_FILES))
+    parser.add_argument('--format', dest='input_format', default='xlsx', choices=TABLE_FORMATS,
+                        help='xlsx workbook, or a directory with shifts and tasks tables in csv or parquet')
+    parser.add_argument('--input', dest='input_path', help='input workbook or directory')
+    parser.add_argument('--batch', nargs='+', metavar='SOURCE',
+                        help='solve many wards: workbooks, table directories, globs, directories of those or a manifest .txt')
+    parser.add_argument('--output', default='results', help='result directory of --batch')
+    parser.add_argument('--workers', type=int, help='worker processes of --batch (default: one per CPU)')
+    parser.add_argument('--resume', action='store_true', help='skip wards whose result is newer than their input')
+    parser.add_argument('--cache', default=cache.DEFAULT_CACHE_PATH, help='solve cache file (SQLite)')
+    parser.add_argument('--no-cache', action='store_true', help='always solve, without reading or filling the cache')
+    args = parser.parse_args()
+    cache_path = None if args.no_cache else args.cache
+    if args.batch:
+        summary = batch_pipeline(args.batch, args.output, args.workers, args.resume, args.unit_minutes, args.result_format,
+                                 cache_path=cache_path)
+        raise SystemExit(1 if (summary['status'] == 'error').any() else 0)
+    main_process_pipeline(args.unit_minutes, args.result_format, args.input_format, args.input_path, cache_path)
@@ -1,127 +1,693 @@
 import os
 import re
+import hashlib
 import ast
+import time
+import queue
+import signal
+import shutil
+import subprocess
+import threading
+import heapq
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import highspy
+import numpy as np
 import pandas as pd
 import pulp as plp
 import json
 from datetime import datetime, timedelta
 
-global scheduled_shifts,scheduled_tasks,scheduled_nurses
-
-def set_time_interval_tasks_to_time_units(data, duration_task):
-    time_units = []
-    index_task = 0
-    for key, item in data.items():
-        day = int(key[-1])
-        for task in item:
-            start_hours, start_minutes = map(int, task['start_time'].split(':'))
-            start_time_unit = int(day*4*24+start_hours*4+start_minutes/15)
-            end_hours, end_minutes = map(int, task['end_time'].split(':'))
-            end_time_unit = int(day*4*24+end_hours*4+end_minutes/15)
-            end_time_unit = min((day+1)*4*24, end_time_unit + duration_task[index_task])
-            time_units.append(range(start_time_unit,end_time_unit))
-            index_task += 1
-    return time_units
-
-def set_time_interval_shifts_to_time_units(data):
-    global scheduled_shifts,scheduled_tasks
-    time_units = []
-    #data = scheduled_shifts
-    for row in data:
-        time_interval_per_shift = []
-        #print(data)
-        for day in row['days'].split(','):
-            day = int(day)
-            start_hours, start_minutes = map(int, row['start_time'].split(':'))
-            start_time_unit = int(day*4*24+start_hours*4+start_minutes/15)
-
-            end_hours, end_minutes = map(int, row['end_time'].split(':'))
-            end_time_unit = int(day*4*24+end_hours*4+end_minutes/15)
-
-            if ',' in scheduled_shifts[0]['break_time']:
-                break_time_units = []
-                for time in row['break_time'].split(','):
-                    break_hours, break_minutes = map(int, time.split(':'))
-                    break_time_unit = int(day*4*24+break_hours*4+break_minutes/15)
-                    for t in range(break_time_unit,break_time_unit+int(row['break_duration']/15)):
-                        break_time_units.append(t)
-            else:
-                break_hours, break_minutes = map(int, row['break_time'].split(':'))
-                break_time_unit = int(day*4*24+break_hours*4+break_minutes/15)
-                break_time_units = range(break_time_unit,break_time_unit+int(row['break_duration']/15))
-
-            for t in range(start_time_unit,end_time_unit):
-                if t not in break_time_units:
-                    time_interval_per_shift.append(t)
-
-        time_units.append(time_interval_per_shift)
-    return time_units
-
-def set_duration_to_time_units(data):
-    time_units = []
-    for key, items in data.items():
-        for task in items:
-            hours, minutes = map(int, task['duration'].split(':'))
-            time_units.append(int(hours*4+minutes/15))
-    return time_units
-
-def take_nurse(time_unit,number_of_needed_nurses):
-    global scheduled_nurses
-    result = []
-    for key, item in scheduled_nurses[time_unit].items():
-        if item > 0:
-            taken_nurses = (min(item,number_of_needed_nurses))
-            nurses_left = item - taken_nurses
-            scheduled_nurses[time_unit][key] = nurses_left
-            for i in range(int(taken_nurses)):
-                    result.append(key)
-            if taken_nurses == number_of_needed_nurses:
-                return result
+#Solver settings accepted by main_process(solver_options=...)
+DEFAULT_SOLVER_OPTIONS = {
+    'solver': 'CBC',     #'CBC' or 'HiGHS'
+    'time_limit': None,  #seconds, the best schedule found so far is returned when it runs out
+    'gap_rel': None,     #relative MIP gap at which the solver may stop
+    'threads': None,
+    'warm_start': False, #start from the initial_solution passed to main_process
+    'heuristic_start': False, #start from heuristic_solution when there is no initial_solution
+    'msg': True,         #print the solver log
+}
+#'quick' skips the MIP and returns heuristic_solution
+SOLVERS = ('CBC', 'HiGHS', 'quick')
+
+#Statuses for which the solver returned a usable schedule
+SOLVED_STATUSES = ('optimal', 'feasible')
+
+PULP_SOLUTION_STATUS = {
+    plp.LpSolutionOptimal: 'optimal',
+    plp.LpSolutionIntegerFeasible: 'feasible',
+    plp.LpSolutionInfeasible: 'infeasible',
+    plp.LpSolutionUnbounded: 'unbounded',
+    plp.LpSolutionNoSolutionFound: 'not_solved',
+}
+
+def solve_info(solver, status, objective, bound, wall_time):
+    #Status, objective, best bound, relative gap and wall time of one solve
+    if status == 'optimal' and bound is None:
+        bound = objective
+    gap = None
+    if status in SOLVED_STATUSES and bound is not None:
+        gap = max(0.0, objective - bound) / max(abs(objective), 1e-10)
+    return {'solver': solver, 'status': status, 'objective': objective, 'bound': bound,
+            'gap': gap, 'wall_time': wall_time}
+
+def cbc_status(solution_path):
+    #Status from the first line of a CBC solution file, e.g. "Stopped on time - objective value 123"
+    with open(solution_path) as f:
+        words = f.readline().split()
+    if not words:
+        return 'not_solved'
+    if words[0] == 'Optimal':
+        return 'optimal'
+    if words[0] in ('Infeasible', 'Integer'):
+        return 'infeasible'
+    if words[0] == 'Unbounded':
+        return 'unbounded'
+    if 'objective' in words:
+        return 'feasible'
+    return 'not_solved'
+
+def cbc_progress(line):
+    #Incumbent and best bound from one CBC log line, e.g.
+    #"Cbc0010I After 100 nodes, 57 on tree, 135598.24 best solution, best possible 132896.1 (4.70 seconds)"
+    match = re.match(r'Cbc0010I After \d+ nodes, \d+ on tree, (\S+) best solution, best possible (\S+)', line)
+    if match:
+        incumbent, bound = float(match.group(1)), float(match.group(2))
+        return {'incumbent': incumbent if incumbent < 1e49 else None, 'bound': bound}
+    match = re.match(r'Cbc00(?:04|12)I Integer solution of (\S+)', line)
+    if match:
+        return {'incumbent': float(match.group(1))}
+    return None
+
+def run_cbc(command, progress=None, stop=None):
+    """Run a CBC command line and return its log.
+
+    With progress or stop the log is read while CBC runs: every incumbent
+    and bound it prints goes to progress (see cbc_progress), and once
+    stop() is true CBC gets SIGINT, on which it ends the search and still
+    writes the best solution found so far.
+    """
+    if progress is None and stop is None:
+        return subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True, text=True).stdout
+    if shutil.which('stdbuf'):
+        command = ['stdbuf', '-oL'] + command #CBC block-buffers its log when writing to a pipe
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, text=True)
+    lines = queue.Queue()
+    def read():
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)
+    threading.Thread(target=read, daemon=True).start()
+    log, stopping = [], False
+    while True:
+        try:
+            line = lines.get(timeout=0.2)
+        except queue.Empty:
+            line = ''
+        if line is None:
+            break
+        log.append(line)
+        values = cbc_progress(line)
+        if values and progress is not None:
+            progress(values)
+        if stop is not None and not stopping and stop():
+            if os.name == 'nt': #No SIGINT for child processes: CBC is ended without its incumbent
+                process.terminate()
             else:
-                number_of_needed_nurses -= taken_nurses
+                process.send_signal(signal.SIGINT)
+            stopping = True
+    process.wait()
+    return ''.join(log)
+
+def highs_progress(highs, progress=None, stop=None):
+    #Report HiGHS's incumbent and bound to progress whenever one changes, and interrupt it once stop() is true
+    last = [None]
+    def on_interrupt(event):
+        if progress is not None:
+            incumbent, bound = event.data_out.mip_primal_bound, event.data_out.mip_dual_bound
+            values = {'incumbent': incumbent if abs(incumbent) < highspy.kHighsInf else None,
+                      'bound': bound if abs(bound) < highspy.kHighsInf else None}
+            if values != last[0]:
+                last[0] = values
+                progress(values)
+        if stop is not None and stop():
+            event.interrupt()
+    highs.cbMipInterrupt.subscribe(on_interrupt)
+
+def cbc_bound(log):
+    #Best bound from the "Lower bound:" line CBC prints when it stops early
+    match = re.search(r'^Lower bound:\s+(\S+)', log, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+def highs_info(highs, wall_time):
+    status = highs.getModelStatus()
+    info = highs.getInfo()
+    if status == highspy.HighsModelStatus.kOptimal:
+        status = 'optimal'
+    elif status == highspy.HighsModelStatus.kInfeasible:
+        status = 'infeasible'
+    elif status == highspy.HighsModelStatus.kUnbounded:
+        status = 'unbounded'
+    elif info.primal_solution_status == 2:
+        status = 'feasible'
+    else:
+        status = 'not_solved'
+    return solve_info('HiGHS', status, info.objective_function_value, info.mip_dual_bound, wall_time)
+
+def initial_values(data, initial_solution):
+    #Values of the x columns and y_i from a previous solution (info['start_times'], info['shift_counts'])
+    start_times = initial_solution['start_times']
+    shift_counts = initial_solution['shift_counts']
+    x_values = [1 if start_times.get(j) == t else 0
+                for j, t in zip(data['col_task'].tolist(), data['col_start'].tolist())]
+    y_values = [shift_counts.get(i, 0) for i in data['set_I']]
+    return x_values, y_values
+
+
+#Length of one time unit in minutes; every time unit index in the model is in these units
+TIME_UNIT_MINUTES = 15
+
+def units_per_day(unit_minutes=TIME_UNIT_MINUTES):
+    if unit_minutes <= 0 or (24*60) % unit_minutes:
+        raise ValueError(f"unit_minutes must divide a day evenly, got {unit_minutes}")
+    return (24*60) // unit_minutes
+
+def clock_minutes(clock):
+    hours, minutes = map(int, clock.split(':'))
+    return hours*60+minutes
+
+def clock_text(minutes):
+    return f"{minutes//60:02d}:{minutes%60:02d}"
+
+def task_arrays(input_tasks):
+    """The tasks as int64 arrays in model order (task j is element j).
+
+    input_tasks is the {day: [task, ...]} dict, or a task table of
+    input.read_tables whose day, nurses_required and *_minutes columns are
+    used as they are, without parsing clock text. Returns 'day', 'index'
+    (within the day), 'start' and 'end' of the start window and 'duration'
+    in minutes, 'nurses', and 'days', every day of the week with or
+    without tasks.
+    """
+    if isinstance(input_tasks, pd.DataFrame):
+        tasks = input_tasks
+        day = tasks['day'].to_numpy(dtype=np.int64)
+        n_days = tasks.attrs.get('days', int(day.max())+1 if len(day) else 0)
+        if (np.diff(day) < 0).any():
+            tasks = tasks.iloc[np.argsort(day, kind='stable')]
+            day = tasks['day'].to_numpy(dtype=np.int64)
+        return {'day': day, 'index': np.arange(len(day)) - np.searchsorted(day, day),
+                'start': tasks['start_time_minutes'].to_numpy(dtype=np.int64),
+                'end': tasks['end_time_minutes'].to_numpy(dtype=np.int64),
+                'duration': tasks['duration_minutes'].to_numpy(dtype=np.int64),
+                'nurses': tasks['nurses_required'].to_numpy(dtype=np.int64),
+                'days': list(range(n_days))}
+    rows = [(int(key[-1]), index, clock_minutes(task['start_time']), clock_minutes(task['end_time']),
+             clock_minutes(task['duration']), task['nurses_required'])
+            for key, items in input_tasks.items() for index, task in enumerate(items)]
+    arrays = dict(zip(('day', 'index', 'start', 'end', 'duration', 'nurses'),
+                      np.array(rows, dtype=np.int64).reshape(-1, 6).T))
+    arrays['days'] = [int(key[-1]) for key in input_tasks]
+    return arrays
+
+def task_dicts(input_tasks):
+    #The {day: [task, ...]} dict of a task table (a dict is returned as it is)
+    if not isinstance(input_tasks, pd.DataFrame):
+        return input_tasks
+    tasks = task_arrays(input_tasks)
+    result = {str(day): [] for day in tasks['days']}
+    for day, start, end, duration, nurses in zip(*(tasks[key].tolist() for key in ('day', 'start', 'end', 'duration', 'nurses'))):
+        result[str(day)].append({'start_time': clock_text(start), 'end_time': clock_text(end),
+                                 'duration': clock_text(duration), 'nurses_required': nurses})
+    return result
+
+def task_units(tasks, unit_minutes=TIME_UNIT_MINUTES):
+    """First and latest start time unit and the length in time units of every task of task_arrays.
+
+    Start units are floored, so a task occupies every time unit its real run
+    can touch: an off-grid start adds its offset into the first time unit
+    before the duration is rounded up.
+    """
+    day_start = tasks['day']*units_per_day(unit_minutes)
+    first = day_start + tasks['start']//unit_minutes
+    last = day_start + tasks['end']//unit_minutes
+    D = -(-(tasks['start'] % unit_minutes + tasks['duration']) // unit_minutes)
+    return first, last, D
+
+def shift_minutes(row, column):
+    #Clock times of a shift in minutes; the shift records of input.solver_input carry them as *_minutes
+    if column + '_minutes' in row:
+        return [int(row[column + '_minutes'])]
+    return [clock_minutes(clock) for clock in row[column].split(',')]
+
+def shift_intervals(data, unit_minutes=TIME_UNIT_MINUTES):
+    """Working and break intervals of every shift as (shift, start, end) time unit arrays.
+
+    Shifts only count for the time units they fully work, breaks for every
+    time unit they touch.
+    """
+    working, breaks = [], []
+    for i, row in enumerate(data):
+        (start,), (end,) = shift_minutes(row, 'start_time'), shift_minutes(row, 'end_time')
+        break_starts = shift_minutes(row, 'break_time')
+        for day in row['days'].split(','):
+            day_start = int(day)*24*60
+            working.append((i, -(-(day_start + start) // unit_minutes), (day_start + end) // unit_minutes))
+            for break_start in break_starts:
+                breaks.append((i, (day_start + break_start) // unit_minutes,
+                               -(-(day_start + break_start + int(row['break_duration'])) // unit_minutes)))
+    return np.array(working, dtype=np.int64).reshape(-1, 3), np.array(breaks, dtype=np.int64).reshape(-1, 3)
+
+def interval_counts(intervals, n_rows, horizon):
+    #How many of the (row, start, end) intervals cover every (row, t), via a difference array
+    counts = np.zeros((n_rows, horizon+1), dtype=np.int64)
+    rows, starts, ends = intervals.T
+    starts, ends = np.clip(starts, 0, horizon), np.clip(ends, 0, horizon)
+    np.add.at(counts, (rows, starts), 1)
+    np.add.at(counts, (rows, ends), -1)
+    return np.cumsum(counts, axis=1)[:, :horizon]
+
+def shift_masks(data, horizon, unit_minutes=TIME_UNIT_MINUTES):
+    """Boolean (shifts x time units) matrix: True where a nurse of the shift is working and not on break."""
+    working, breaks = shift_intervals(data, unit_minutes)
+    return (interval_counts(working, len(data), horizon) > 0) & (interval_counts(breaks, len(data), horizon) == 0)
+
+def expand_ranges(starts, lengths):
+    #Concatenation of range(starts[i], starts[i]+lengths[i]) for every i
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+
+def coverage_incidence(col_start, col_length, horizon):
+    """CSR incidence of start columns over time units.
+
+    Column c starts at col_start[c] and runs for col_length[c] time units.
+    The columns covering time unit t are indices[indptr[t]:indptr[t+1]].
+    """
+    col_ids = np.repeat(np.arange(len(col_start)), col_length)
+    time_units = expand_ranges(col_start, col_length)
+    indices = col_ids[np.argsort(time_units, kind='stable')]
+    indptr = np.zeros(horizon+1, dtype=np.int64)
+    np.cumsum(np.bincount(time_units, minlength=horizon), out=indptr[1:])
+    return indptr, indices
+
+def duty_ends(set_L):
+    #duty_ends[i, t]: first time unit >= t at which shift i is off duty (its end or a break)
+    horizon = set_L.shape[1]
+    off_at = np.where(set_L, horizon, np.arange(horizon))
+    return np.minimum.accumulate(off_at[:, ::-1], axis=1)[:, ::-1]
 
+def assign_nurses(set_L, counts, starting_times_tasks, D, N):
+    """Assign concrete nurses, (shift, number) pairs, to the scheduled tasks.
 
+    Sweeps over the time units where a task starts or ends or a shift goes
+    on or off duty. A task keeps its nurses for as long as their shift is
+    on duty, gets the same nurse back after a break when that nurse is still
+    free, and otherwise takes a free nurse from the shift that stays on duty
+    closest past the task's end. Coverage of the solution guarantees that
+    every time unit finds enough free nurses.
 
+    Returns {task: [[(shift, number), ...] for every time unit of the task]}.
+    """
+    set_L = np.asarray(set_L, dtype=bool)
+    horizon = set_L.shape[1]
+    ends = duty_ends(set_L)
+    counts = [int(round(count)) for count in counts]
+    free = [[True] * count for count in counts]
+    pool = [list(range(count)) for count in counts] #heaps of free nurse numbers, stale entries are skipped
 
+    task_start = {task: start for task, start in starting_times_tasks}
+    changes = np.flatnonzero((set_L[:, 1:] != set_L[:, :-1]).any(axis=0)) + 1
+    events = sorted(set(changes.tolist()) | {0} | set(task_start.values())
+                    | {start + D[task] for task, start in task_start.items()})
+    starting = {}
+    for task, start in sorted(task_start.items()):
+        starting.setdefault(start, []).append(task)
 
-def main_process(input_tasks,input_scheduled_shifts):
-    global scheduled_shifts,scheduled_tasks
+    def release(nurse):
+        i, k = nurse
+        free[i][k] = True
+        heapq.heappush(pool[i], k)
+
+    def take(i):
+        while pool[i]:
+            k = heapq.heappop(pool[i])
+            if free[i][k]:
+                free[i][k] = False
+                return (i, k)
+
+    slots = {} #nurse slots of the running tasks, None when the slot lost its nurse
+    previous = {} #last nurse per slot, to hand her back after a break
+    assignment = {task: [] for task in task_start}
+    for e, t in enumerate(events):
+        if t >= horizon:
+            break
+        for task in [task for task in slots if task_start[task] + D[task] <= t]:
+            for nurse in slots.pop(task):
+                if nurse is not None:
+                    release(nurse)
+        for task, nurses in slots.items():
+            for s, nurse in enumerate(nurses):
+                if nurse is not None and not set_L[nurse[0], t]:
+                    release(nurse)
+                    nurses[s] = None
+        for task in starting.get(t, ()):
+            slots[task] = [None] * int(N[task])
+            previous[task] = [None] * int(N[task])
+
+        on_duty = np.flatnonzero(set_L[:, t]).tolist()
+        for task, nurses in slots.items():
+            if None not in nurses:
+                continue
+            end = task_start[task] + D[task]
+            #Best fit: the shift covering the rest of the task that leaves duty first, else the one staying longest
+            order = sorted(on_duty, key=lambda i: (ends[i, t] < end, ends[i, t] if ends[i, t] >= end else -ends[i, t]))
+            for s, nurse in enumerate(nurses):
+                if nurse is not None:
+                    continue
+                last = previous[task][s]
+                if last is not None and set_L[last[0], t] and free[last[0]][last[1]]:
+                    free[last[0]][last[1]] = False
+                    nurses[s] = last
+                    continue
+                for i in order:
+                    nurses[s] = take(i)
+                    if nurses[s] is not None:
+                        break
+            previous[task] = list(nurses)
+
+        until = min(events[e+1] if e+1 < len(events) else horizon, horizon)
+        for task, nurses in slots.items():
+            units = [nurse for nurse in nurses if nurse is not None]
+            assignment[task].extend(list(units) for _ in range(min(until, task_start[task] + D[task]) - t))
+    return assignment
+
+
+def event_grid(set_S, D, L, horizon):
+    """Start times that are enough for an optimal schedule.
+
+    Moving a task one time unit earlier never breaks coverage unless it
+    would leave its window, a shift starts (or ends its break) at the
+    task's start, or another task ends right before it. Pushing every task
+    as early as possible therefore gives an optimal schedule in which all
+    starts lie on the window starts and supply increases, closed under
+    'start + duration' of the tasks that may start there.
+    """
+    starts = np.array([S.start for S in set_S], dtype=np.int64)
+    stops = np.array([S.stop for S in set_S], dtype=np.int64)
+    D = np.array(D, dtype=np.int64)
+    grid = np.zeros(horizon, dtype=bool)
+    grid[starts[stops > starts]] = True
+    grid[1:] |= (L[:, 1:] & ~L[:, :-1]).any(axis=0)
+    for t in range(horizon):
+        if grid[t]:
+            ends = t + D[(starts <= t) & (t < stops)]
+            grid[ends[ends < horizon]] = True
+    return grid
+
+class InfeasibleInput(RuntimeError):
+    """Raised by main_process when precheck finds tasks that no schedule can cover.
+
+    problems holds the diagnostics of precheck, one dict per task.
+    """
+    def __init__(self, problems):
+        self.problems = problems
+        shown = '; '.join(problem['message'] for problem in problems[:5])
+        more = f" (and {len(problems)-5} more)" if len(problems) > 5 else ''
+        super().__init__(f"No schedule can cover the tasks: {shown}{more}")
+
+    def __reduce__(self):
+        #Rebuilt from the problems when sent between processes
+        return InfeasibleInput, (self.problems,)
+
+
+def covering_bound(A, b, C):
+    #Optimum of the LP min C.y subject to A y >= b, y >= 0 (HiGHS); None when it has none
+    rows = np.unique(np.column_stack([A, b])[b > 0].astype(float), axis=0)
+    if len(rows) == 0:
+        return 0.0
+    A, b = rows[:, :-1], rows[:, -1]
+    cols, row_ids = np.nonzero(A.T)
+    lp = highspy.HighsLp()
+    lp.num_col_, lp.num_row_ = A.shape[1], A.shape[0]
+    lp.col_cost_ = np.asarray(C, dtype=float)
+    lp.col_lower_, lp.col_upper_ = np.zeros(A.shape[1]), np.full(A.shape[1], highspy.kHighsInf)
+    lp.row_lower_, lp.row_upper_ = b, np.full(len(b), highspy.kHighsInf)
+    lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+    lp.a_matrix_.start_ = np.concatenate(([0], np.cumsum(np.bincount(cols, minlength=A.shape[1])))).astype(np.int32)
+    lp.a_matrix_.index_ = row_ids.astype(np.int32)
+    lp.a_matrix_.value_ = A.T[cols, row_ids]
+    highs = highspy.Highs()
+    highs.setOptionValue('output_flag', False)
+    highs.passModel(lp)
+    highs.run()
+    if highs.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+        return None
+    return float(highs.getInfo().objective_function_value)
+
+def precheck(input_tasks,input_scheduled_shifts,unit_minutes=TIME_UNIT_MINUTES):
+    """Infeasibility diagnostics and a cost lower bound, before any model is built.
+
+    A task cannot be scheduled when its duration does not fit between its
+    first start and midnight or its latest start, or when every start in its
+    window runs into a time unit no shift works. Returns {'problems': [...],
+    'lower_bound': float or None}; every problem names the day, the task
+    index within the day and the time unit within the day where it occurs.
+    lower_bound is the optimum of a covering LP over the shift counts (see
+    below), None when there are problems.
+    """
+    upd = units_per_day(unit_minutes)
+    tasks = task_arrays(input_tasks)
+    days, indexes, N = tasks['day'], tasks['index'], tasks['nurses']
+    first, last, D = task_units(tasks, unit_minutes)
+    horizon = (max(tasks['days'])+1)*upd
+    set_L = shift_masks(input_scheduled_shifts, horizon, unit_minutes)
+    latest = np.minimum(last, (days+1)*upd - D) #Latest start, as in model_data
+
+    #Starts inside the window whose time units are all worked by some shift
+    unstaffed = np.concatenate(([0], np.cumsum(~set_L.any(axis=0))))
+    lengths = np.maximum(latest - first + 1, 0)
+    col_task = np.repeat(np.arange(len(D)), lengths)
+    col_start = expand_ranges(first, lengths)
+    staffed = unstaffed[col_start + D[col_task]] == unstaffed[col_start]
+    covered = np.bincount(col_task[staffed], minlength=len(D)) > 0
+
+    problems = []
+    for j in np.flatnonzero(~covered).tolist():
+        where = (f"day {days[j]}, task {indexes[j]} ({clock_text(int(tasks['start'][j]))}-"
+                 f"{clock_text(int(tasks['end'][j]))}, {clock_text(int(tasks['duration'][j]))})")
+        if lengths[j] == 0:
+            problems.append({'day': int(days[j]), 'task': int(indexes[j]), 'time_unit': int(first[j] - days[j]*upd),
+                             'message': f"{where}: the duration does not fit in the window"})
+        else:
+            gaps = np.flatnonzero(~set_L[:, first[j]:latest[j]+D[j]].any(axis=0))
+            t = int(gaps[0]) + int(first[j] - days[j]*upd)
+            problems.append({'day': int(days[j]), 'task': int(indexes[j]), 'time_unit': t,
+                             'message': f"{where}: no shift works at {clock_text(t*unit_minutes)} (time unit {t}) and every start runs into such a time unit"})
+    if problems:
+        return {'problems': problems, 'lower_bound': None}
+
+    #Lower bound: any schedule has at least N nurses on every time unit a task occupies wherever it starts
+    #(from its latest start to the end of its earliest start), N nurses on shifts working somewhere in
+    #every task's window, and as many nurse time units on every day as its tasks take
+    mandatory = np.zeros(horizon+1, dtype=np.int64)
+    fixed = latest < first + D
+    np.add.at(mandatory, latest[fixed], N[fixed])
+    np.add.at(mandatory, (first + D)[fixed], -N[fixed])
+    mandatory = np.cumsum(mandatory)[:horizon]
+    worked = np.concatenate((np.zeros((len(set_L), 1), dtype=np.int64), np.cumsum(set_L, axis=1)), axis=1)
+    in_window = (worked[:, latest + D] > worked[:, first]).T
+    per_day = np.add.reduceat(set_L, np.arange(0, horizon, upd), axis=1).T
+    workload = np.bincount(days, weights=N*D, minlength=horizon // upd)
+    A = np.concatenate([set_L.T, in_window, per_day])
+    b = np.concatenate([mandatory, N, workload])
+    C = [shift['cost'] for shift in input_scheduled_shifts]
+    return {'problems': [], 'lower_bound': covering_bound(A, b, C)}
+
+def model_data(input_tasks,input_scheduled_shifts,aggregate=False,unit_minutes=TIME_UNIT_MINUTES):
+    """Sets and constants of the model, shared by the PuLP and MPS builders.
+
+    col_task/col_start list the feasible start columns: column c is the
+    start variable x_{col_task[c],col_start[c]}. set_R lists the time units
+    that get a coverage row (constraint3).
+
+    aggregate=True keeps only the start columns on event_grid, and coverage
+    rows only where a column starts or a shift ends or goes on break: in
+    between, demand cannot rise and supply cannot fall, so those rows are
+    implied. Both reductions are exact.
+    """
     scheduled_shifts = input_scheduled_shifts
-    scheduled_tasks = input_tasks
+    tasks = task_arrays(input_tasks)
     set_I = range(len(scheduled_shifts))
-    set_J = range(sum(len(value) for value in scheduled_tasks.values()))
-    set_T = range(len(scheduled_tasks.keys())*4*24)
-    set_L = set_time_interval_shifts_to_time_units(scheduled_shifts)
-    set_L_binary = {}
-    for i in set_I:
-        set_L_i = []
-        for t in set_T:
-            if t in set_L[i]:
-                set_L_i.append(1)
-            else:
-                set_L_i.append(0)
-        set_L_binary[i] = set_L_i
-    set_L = set_L_binary
+    set_J = range(len(tasks['day']))
+    set_T = range((max(tasks['days'])+1)*units_per_day(unit_minutes))
+    set_L = shift_masks(scheduled_shifts, len(set_T), unit_minutes) #set_L[i,t]: shift i works during time unit t
 
     #Constants
-    N = [] #The number of nurses required for job every j
-    for key, items in scheduled_tasks.items():
-        for task in items:
-            N.append(task['nurses_required'])
-    D = set_duration_to_time_units(scheduled_tasks) #The number of time units required for every job j
+    N = tasks['nurses'].tolist() #The number of nurses required for job every j
+    first, last, D = task_units(tasks, unit_minutes) #D: the number of time units required for every job j
     C = [scheduled_shifts[shift]['cost'] for shift in set_I] #Costs for every shift
 
-    set_K = set_time_interval_tasks_to_time_units(scheduled_tasks,D)
-    
+    #Feasible starting times for every job j: its window, as long as the job ends by midnight
+    set_S = [range(start, stop) for start, stop in
+             zip(first.tolist(), (np.minimum((tasks['day']+1)*units_per_day(unit_minutes), last + D) - D + 1).tolist())]
+    D = D.tolist()
+
+    lengths = np.array([len(set_S[j]) for j in set_J], dtype=np.int64)
+    col_task = np.repeat(np.arange(len(set_J)), lengths)
+    col_start = expand_ranges(np.array([set_S[j].start for j in set_J], dtype=np.int64), lengths)
+    set_R = set_T
+
+    if aggregate:
+        on_grid = event_grid(set_S, D, set_L, len(set_T))[col_start]
+        col_task, col_start = col_task[on_grid], col_start[on_grid]
+        rows = np.zeros(len(set_T), dtype=bool)
+        rows[col_start] = True
+        rows[1:] |= (set_L[:, :-1] & ~set_L[:, 1:]).any(axis=0)
+        set_R = np.flatnonzero(rows).tolist()
+
+    #Start times kept for every job j, in column order
+    task_starts = [[] for j in set_J]
+    for j, t in zip(col_task.tolist(), col_start.tolist()):
+        task_starts[j].append(t)
+
+    return {'set_I': set_I, 'set_J': set_J, 'set_T': set_T, 'set_R': set_R, 'set_L': set_L, 'set_S': set_S,
+            'N': N, 'D': D, 'C': C, 'col_task': col_task, 'col_start': col_start, 'task_starts': task_starts,
+            'task_index': tasks['index'].tolist(), 'days': tasks['days']}
+
+
+def cover_demand(set_L, C, demand):
+    #Greedy multicover: add nurses of the shift covering most uncovered time units per unit of cost
+    L = set_L.astype(np.int64)
+    counts = np.zeros(len(C), dtype=np.int64)
+    residual = demand.copy()
+    while (residual > 0).any():
+        uncovered = residual > 0
+        gain = L @ uncovered
+        if gain.max() == 0:
+            return None
+        score = np.where(gain > 0, gain / np.maximum(C, 1e-9), -1.0)
+        i = int(np.argmax(score))
+        added = int(residual[set_L[i] & uncovered].min())
+        counts[i] += added
+        residual -= added * L[i]
+    return counts
+
+def prune_counts(set_L, C, counts, demand):
+    #Drop nurses, most expensive shift first, while the demand stays covered
+    counts = counts.copy()
+    slack = counts @ set_L - demand
+    for i in np.argsort(-C, kind='stable').tolist():
+        if counts[i] == 0:
+            continue
+        removed = min(int(counts[i]), int(slack[set_L[i]].min(initial=counts[i])))
+        counts[i] -= removed
+        slack -= removed * set_L[i]
+    return counts
+
+def heuristic_solution(data, rounds=3):
+    """Feasible schedule in milliseconds, without a MIP.
+
+    Places the tasks, largest nurse-hours first, at the start time where the
+    demand placed so far is lowest (among starts where some shift works
+    every time unit of the task), covers that demand greedily with the
+    cheapest shifts per covered time unit and drops nurses that are not
+    needed. Each of the improvement rounds then moves every task to where
+    the current nurses have the most room and covers and prunes again.
+    Returns an initial_solution dict (start_times, shift_counts), or None
+    when some task cannot be placed inside the shifts.
+    """
+    set_L, N, D = data['set_L'], np.array(data['N'], dtype=np.int64), np.array(data['D'], dtype=np.int64)
+    C = np.array(data['C'], dtype=float)
+    horizon = set_L.shape[1]
+    demand = np.zeros(horizon, dtype=np.int64)
+    unstaffed = np.concatenate(([0], np.cumsum(~set_L.any(axis=0))))
+    order = np.argsort(-N*D, kind='stable').tolist()
+    candidates, start_times = {}, {}
+    for j in order:
+        starts = np.array(data['task_starts'][j], dtype=np.int64)
+        starts = starts[unstaffed[starts + D[j]] == unstaffed[starts]]
+        if len(starts) == 0:
+            return None
+        window = np.concatenate(([0], np.cumsum(demand)))
+        t = int(starts[np.argmin(window[starts + D[j]] - window[starts])])
+        demand[t:t+D[j]] += N[j]
+        candidates[j], start_times[j] = starts, t
+    counts = cover_demand(set_L, C, demand)
+    if counts is None:
+        return None
+    counts = prune_counts(set_L, C, counts, demand)
+    best = (C @ counts, counts, dict(start_times))
+
+    for _ in range(rounds):
+        supply = counts @ set_L
+        for j in order:
+            t = start_times[j]
+            demand[t:t+D[j]] -= N[j]
+            starts = candidates[j]
+            room = np.lib.stride_tricks.sliding_window_view(supply - demand, D[j]).min(axis=1)[starts]
+            window = np.concatenate(([0], np.cumsum(demand)))
+            t = int(starts[np.lexsort((window[starts + D[j]] - window[starts], -room))[0]])
+            demand[t:t+D[j]] += N[j]
+            start_times[j] = t
+        if (supply >= demand).all():
+            counts = prune_counts(set_L, C, counts, demand)
+        fresh = prune_counts(set_L, C, cover_demand(set_L, C, demand), demand)
+        if not (supply >= demand).all() or C @ fresh < C @ counts:
+            counts = fresh
+        if C @ counts >= best[0]:
+            break
+        best = (C @ counts, counts, dict(start_times))
+
+    _, counts, start_times = best
+    return {'start_times': start_times, 'shift_counts': dict(enumerate(counts.astype(float).tolist()))}
+
 
+def solve_quick(data):
+    #heuristic_solution in the (shift counts, start times, info) form of solve_pulp/solve_mps
+    start = time.perf_counter()
+    solution = heuristic_solution(data)
+    wall_time = time.perf_counter() - start
+    if solution is None:
+        info = solve_info('quick', 'infeasible', None, None, wall_time)
+        info['timings'] = {'solve': wall_time, 'extract': 0.0}
+        return {}, [], info
+    objective = float(np.dot(data['C'], list(solution['shift_counts'].values())))
+    info = solve_info('quick', 'feasible', objective, None, wall_time)
+    info['timings'] = {'solve': wall_time, 'extract': 0.0}
+    return solution['shift_counts'], sorted(solution['start_times'].items()), info
+
+
+def build_model(input_tasks,input_scheduled_shifts,sparse=True,aggregate=False,unit_minutes=TIME_UNIT_MINUTES):
+    """Build the PuLP model for one week.
+
+    With sparse=True only the start variables x_{j,t} inside the feasible
+    window of task j are created, so constraint2 (forcing the others to
+    zero) is not needed. sparse=False builds the original dense model.
+    aggregate=True (sparse only) builds the event grid model of model_data.
+    Time units are unit_minutes long.
+    """
+    if aggregate and not sparse:
+        raise ValueError("aggregate=True needs sparse=True")
+    data = model_data(input_tasks,input_scheduled_shifts,aggregate,unit_minutes)
+    set_I, set_J, set_T, set_L, set_S = data['set_I'], data['set_J'], data['set_T'], data['set_L'], data['set_S']
+    set_R, task_starts = data['set_R'], data['task_starts']
+    N, D, C = data['N'], data['D'], data['C']
+    col_task, col_start = data['col_task'], data['col_start']
 
     opt_model = plp.LpProblem(name='MIP_Model')
 
     #Decision variables
     #Decide the starting time of task j
-    x_vars  = {(j,t):
-                plp.LpVariable(cat='Binary', lowBound=0, name="x_{0}_{1}".format(j,t)) 
-                for j in set_J for t in set_T}
+    if sparse:
+        x_vars  = {(j,t):
+                    plp.LpVariable(cat='Binary', lowBound=0, name="x_{0}_{1}".format(j,t))
+                    for j,t in zip(col_task.tolist(),col_start.tolist())}
+    else:
+        x_vars  = {(j,t):
+                    plp.LpVariable(cat='Binary', lowBound=0, name="x_{0}_{1}".format(j,t)) 
+                    for j in set_J for t in set_T}
 
     #Decide the number of shifts i that are going to be scheduled
     y_vars = {i:
@@ -133,78 +699,548 @@ def main_process(input_tasks,input_scheduled_shifts):
     #Each seperate task must have a starting time in it's time interval
     constraints = {(j) : opt_model.addConstraint(
         plp.LpConstraint(
-            e=plp.lpSum(x_vars[j, t] for t in range(set_K[j][0],set_K[j][-1]-D[j]+2)),
+            e=plp.lpSum(x_vars[j, t] for t in task_starts[j]),
             sense=plp.LpConstraintEQ,
             rhs=1,
             name="constraint1_{0}".format(j)))
         for j in set_J}
 
     #A task can't start when it's outside it's time interval
-    constraints = {(j): opt_model.addConstraint(
-        plp.LpConstraint(
-            e=plp.lpSum(x_vars[j, t] for t in set_T if t not in range(set_K[j][0],set_K[j][-1]-D[j]+2)),
-            sense=plp.LpConstraintEQ,
-            rhs=0,
-            name="constraint2_{0}".format(j)))
-        for j in set_J}
+    if not sparse:
+        constraints = {(j): opt_model.addConstraint(
+            plp.LpConstraint(
+                e=plp.lpSum(x_vars[j, t] for t in set_T if t not in set_S[j]),
+                sense=plp.LpConstraintEQ,
+                rhs=0,
+                name="constraint2_{0}".format(j)))
+            for j in set_J}
 
     #For every time unit there must be enough nurses to handle all the tasks
-    constraints = {(t): opt_model.addConstraint(
-        plp.LpConstraint(
-            e=plp.lpSum(y_vars[i]*set_L[i][t] for i in set_I)-plp.lpSum(N[j]*x_vars[j, k] for j in set_J for k in range(max(0,t-D[j]+1),t+1)),
-            sense=plp.LpConstraintGE,
-            rhs=0,
-            name="constraint3_{0}".format(t)))
-        for t in set_T}
+    if sparse:
+        #Each row only touches the start columns that actually cover t
+        indptr, indices = coverage_incidence(col_start, np.array(D, dtype=np.int64)[col_task], len(set_T))
+        x_list = list(x_vars.values())
+        x_coef = (-np.array(N)[col_task]).tolist()
+        shifts_at = [np.flatnonzero(working).tolist() for working in set_L.T]
+        constraints = {(t): opt_model.addConstraint(
+            plp.LpConstraint(
+                e=plp.LpAffineExpression(
+                    [(y_vars[i],1) for i in shifts_at[t]]+
+                    [(x_list[c],x_coef[c]) for c in indices[indptr[t]:indptr[t+1]].tolist()]),
+                sense=plp.LpConstraintGE,
+                rhs=0,
+                name="constraint3_{0}".format(t)))
+            for t in set_R}
+    else:
+        constraints = {(t): opt_model.addConstraint(
+            plp.LpConstraint(
+                e=plp.lpSum(y_vars[i]*int(set_L[i,t]) for i in set_I)-plp.lpSum(N[j]*x_vars[j, k] for j in set_J for k in range(max(0,t-D[j]+1),t+1)),
+                sense=plp.LpConstraintGE,
+                rhs=0,
+                name="constraint3_{0}".format(t)))
+            for t in set_T}
 
     #Objective function
     objective = plp.lpSum(y_vars[i]*C[i] for i in set_I)
     opt_model.sense = plp.LpMinimize
     opt_model.setObjective(objective)
 
-    #Solve LP Model
-    opt_model.solve()
-            
-    global scheduled_nurses
-
-
-    scheduled_nurses = []
-    amount_of_scheduled_nurses = {}
-    for v in opt_model.variables():
-        if v.name[0] == 'y':
-            amount_of_scheduled_nurses[int(v.name.split('_')[1])] = v.varValue
-            
-    scheduled_nurses = []
-    for t in set_T:
-        nurses = {}
-        for shift, item in amount_of_scheduled_nurses.items():
-            nurses[shift] = set_L_binary[shift][t]*item
-        scheduled_nurses.append(nurses)
-        
-    starting_times_tasks = []
-    for v in opt_model.variables():
-        if v.name[0] == 'x' and v.varValue > 0:
-            starting_times_tasks.append(v.name.split('_'))
-            
-    tasks_indexes = []
-    for key, item in scheduled_tasks.items():
-        index = 0
-        for task in item:
-            tasks_indexes.append(index)
-            index+=1
-            
-    result = {}
-    for key in scheduled_tasks.keys():
-        result[int(key[-1])] = {}
-        
-    for row in starting_times_tasks:
-        task = int(row[1])
+    return dict(data, opt_model=opt_model, x_vars=x_vars, y_vars=y_vars)
+
+
+def write_mps(data, path):
+    """Stream the sparse model to a free-format MPS file without PuLP objects.
+
+    Columns C0.. are the start variables in (col_task, col_start) order,
+    followed by one y_i column per shift. Rows R0..R{J-1} are constraint1
+    and row R{J+t} is constraint3 for time unit t in set_R.
+    """
+    set_I, set_J, set_T, set_R, set_L = data['set_I'], data['set_J'], data['set_T'], data['set_R'], data['set_L']
+    col_task, col_start = data['col_task'], data['col_start']
+    n_tasks, n_x = len(set_J), len(col_task)
+    D = np.array(data['D'], dtype=np.int64)
+    N = np.array(data['N'], dtype=np.int64)
+    has_row = np.zeros(len(set_T), dtype=bool)
+    has_row[set_R] = True
+
+    #Every x column has its constraint1 entry followed by the coverage rows it touches
+    lengths = D[col_task] + 1
+    entry_col = np.repeat(np.arange(n_x), lengths)
+    position = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    entry_time = col_start[entry_col] + position - 1
+    keep = (position == 0) | has_row[np.maximum(entry_time, 0)]
+    entry_col, position, entry_time = entry_col[keep], position[keep], entry_time[keep]
+    entry_row = np.where(position == 0, col_task[entry_col], n_tasks + entry_time)
+    entry_value = np.where(position == 0, 1, -N[col_task[entry_col]])
+
+    with open(path, 'w') as f:
+        f.write("NAME MIP_Model\nROWS\n N OBJ\n")
+        f.writelines(f" E R{j}\n" for j in set_J)
+        f.writelines(f" G R{n_tasks+t}\n" for t in set_R)
+        f.write("COLUMNS\n    MARKER 'MARKER' 'INTORG'\n")
+        for chunk in range(0, len(entry_col), 65536):
+            rows = slice(chunk, chunk+65536)
+            f.writelines(f" C{c} R{r} {v}\n" for c, r, v in
+                         zip(entry_col[rows].tolist(), entry_row[rows].tolist(), entry_value[rows].tolist()))
+        for i in set_I:
+            f.write(f" C{n_x+i} OBJ {data['C'][i]!r}\n")
+            f.writelines(f" C{n_x+i} R{n_tasks+t} 1\n" for t in np.asarray(set_R)[set_L[i, set_R]].tolist())
+        f.write("    MARKER 'MARKER' 'INTEND'\nRHS\n")
+        f.writelines(f" RHS R{j} 1\n" for j in set_J)
+        f.write("BOUNDS\n")
+        f.writelines(f" BV BND C{c}\n" for c in range(n_x))
+        f.writelines(f" LO BND C{n_x+i} 0\n" for i in set_I)
+        f.write("ENDATA\n")
+
+
+#The 'threads' value each thread's HiGHS scheduler was sized for (highspy keeps one scheduler per calling thread)
+highs_scheduler = threading.local()
+
+def highs_threads(threads):
+    """Get the calling thread's HiGHS scheduler ready for a run with this 'threads' option.
+
+    HiGHS sizes a thread's scheduler on the first run in that thread (the
+    precheck LP included) and then refuses any other 'threads' value with
+    status not_solved. The scheduler is dropped only when its size has to
+    change, and as it belongs to the calling thread this cannot disturb runs
+    in other threads.
+    """
+    if threads is not None and getattr(highs_scheduler, 'threads', None) != int(threads):
+        highspy.Highs.resetGlobalScheduler(True)
+        highs_scheduler.threads = int(threads)
+
+
+def solve_pulp(data, options, initial_solution=None):
+    """Solve the PuLP model built by build_model with CBC or HiGHS.
+
+    Returns the number of nurses per shift, the (task, start time) pairs
+    and the solve info. PuLP's HiGHS interface has no MIP start, so
+    warm_start only applies to CBC here (use backend='mps' for HiGHS).
+    """
+    opt_model, x_vars, y_vars = data['opt_model'], data['x_vars'], data['y_vars']
+    if options['warm_start'] and initial_solution:
+        start_times = initial_solution['start_times']
+        for (j, t), var in x_vars.items():
+            var.setInitialValue(1 if start_times.get(j) == t else 0)
+        for i, var in y_vars.items():
+            var.setInitialValue(initial_solution['shift_counts'].get(i, 0))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_path = os.path.join(tmp_dir, 'solver.log')
+        if options['solver'] == 'HiGHS':
+            highs_threads(options['threads'])
+            solver = plp.HiGHS(msg=options['msg'], timeLimit=options['time_limit'],
+                               gapRel=options['gap_rel'], threads=options['threads'])
+        else:
+            solver = plp.PULP_CBC_CMD(msg=False, logPath=log_path, timeLimit=options['time_limit'],
+                                      gapRel=options['gap_rel'], threads=options['threads'],
+                                      warmStart=options['warm_start'] and bool(initial_solution))
+        start = time.perf_counter()
+        opt_model.solve(solver)
+        wall_time = time.perf_counter() - start
+
+        if options['solver'] == 'HiGHS':
+            info = highs_info(opt_model.solverModel, wall_time)
+        else:
+            with open(log_path) as f:
+                log = f.read()
+            if options['msg']:
+                print(log)
+            info = solve_info('CBC', PULP_SOLUTION_STATUS.get(opt_model.sol_status, 'not_solved'),
+                              plp.value(opt_model.objective), cbc_bound(log), wall_time)
+
+    #Read the solution straight from the variable handles
+    extract_start = time.perf_counter()
+    amount_of_scheduled_nurses = {i: var.varValue or 0.0 for i, var in y_vars.items()}
+    starting_times_tasks = [key for key, var in x_vars.items() if (var.varValue or 0) > 0.5]
+    info['timings'] = {'solve': wall_time, 'extract': time.perf_counter() - extract_start}
+    return amount_of_scheduled_nurses, starting_times_tasks, info
+
+
+def solve_mps(data, options, initial_solution=None, progress=None, stop=None):
+    """Write the model with write_mps and solve the file with CBC or HiGHS.
+
+    CBC is the binary shipped with PuLP; HiGHS reads the file through
+    highspy. Returns the number of nurses per shift, the (task, start time)
+    pairs and the solve info. progress receives the incumbent and bound as
+    the solver finds them, and stop() ends the search early with the best
+    schedule so far (see run_cbc and highs_progress); info['stopped'] is
+    set when that cut the search short.
+    """
+    n_x = len(data['col_task'])
+    warm_start = options['warm_start'] and bool(initial_solution)
+    interrupted = [False]
+    def solver_stop():
+        #stop() as seen by the solver while it runs: remembers that it was asked to end early
+        interrupted[0] = interrupted[0] or bool(stop())
+        return interrupted[0]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        mps_path = os.path.join(tmp_dir, 'model.mps')
+        write_mps(data, mps_path)
+
+        if options['solver'] == 'HiGHS':
+            highs = highspy.Highs()
+            highs.setOptionValue('output_flag', bool(options['msg']))
+            if options['time_limit'] is not None:
+                highs.setOptionValue('time_limit', float(options['time_limit']))
+            if options['gap_rel'] is not None:
+                highs.setOptionValue('mip_rel_gap', float(options['gap_rel']))
+            if options['threads'] is not None:
+                highs_threads(options['threads'])
+                highs.setOptionValue('threads', int(options['threads']))
+            highs.readModel(mps_path)
+            if warm_start:
+                x_values, y_values = initial_values(data, initial_solution)
+                solution = highspy.HighsSolution()
+                solution.col_value = x_values + y_values
+                highs.setSolution(solution)
+            if progress is not None or stop is not None:
+                highs_progress(highs, progress, solver_stop if stop is not None else None)
+            start = time.perf_counter()
+            highs.run()
+            wall_time = time.perf_counter() - start
+            info = highs_info(highs, wall_time)
+            extract_start = time.perf_counter()
+            values = np.asarray(highs.getSolution().col_value)
+        else:
+            solution_path = os.path.join(tmp_dir, 'model.sol')
+            command = [plp.PULP_CBC_CMD().path, mps_path]
+            if warm_start:
+                #MIP start in the solution file format CBC writes itself
+                start_path = os.path.join(tmp_dir, 'start.sol')
+                x_values, y_values = initial_values(data, initial_solution)
+                with open(start_path, 'w') as f:
+                    f.write("Stopped on time - objective value 0\n")
+                    f.writelines(f"{c} C{c} {value} 0\n" for c, value in enumerate(x_values + y_values))
+                command += ['-mips', start_path]
+            if options['time_limit'] is not None:
+                command += ['-sec', str(options['time_limit'])]
+            if options['gap_rel'] is not None:
+                command += ['-ratioGap', str(options['gap_rel'])]
+            if options['threads'] is not None:
+                command += ['-threads', str(options['threads'])]
+            command += ['-solve', '-solution', solution_path]
+            start = time.perf_counter()
+            log = run_cbc(command, progress, solver_stop if stop is not None else None)
+            wall_time = time.perf_counter() - start
+            if options['msg']:
+                print(log)
+            extract_start = time.perf_counter()
+            values = np.zeros(n_x + len(data['set_I']))
+            if not os.path.exists(solution_path): #CBC was ended before it wrote a solution
+                info = solve_info('CBC', 'not_solved', None, None, wall_time)
+            else:
+                with open(solution_path) as f:
+                    next(f) #status line
+                    for line in f:
+                        fields = line.split()
+                        if fields[0] == '**':
+                            fields = fields[1:]
+                        values[int(fields[1][1:])] = float(fields[2])
+                objective = float(np.dot(data['C'], values[n_x:]))
+                info = solve_info('CBC', cbc_status(solution_path), objective, cbc_bound(log), wall_time)
+
+    #The solution is one array in column order: x columns first, then y_i
+    taken = values[:n_x] > 0.5
+    starting_times_tasks = list(zip(data['col_task'][taken].tolist(), data['col_start'][taken].tolist()))
+    amount_of_scheduled_nurses = dict(enumerate(values[n_x:].tolist()))
+    info['timings'] = {'solve': wall_time, 'extract': time.perf_counter() - extract_start}
+    #A stop that came after the search was already proven optimal changed nothing
+    info['stopped'] = interrupted[0] and info['status'] != 'optimal'
+    return amount_of_scheduled_nurses, starting_times_tasks, info
+
+
+def split_by_day_groups(input_tasks,input_scheduled_shifts):
+    """Split the week into subproblems that can be solved independently.
+
+    Tasks never cross midnight, but y_i is shared by every day in shift i's
+    'days', so only days linked through a shift template have to be solved
+    together. Returns one (tasks, shifts, task_ids, shift_ids) tuple per
+    group that has tasks; the ids map the subproblem's task and shift
+    indexes back to the whole week.
+    """
+    task_ids = {}
+    j = 0
+    for key, items in input_tasks.items():
+        task_ids[key] = list(range(j, j+len(items)))
+        j += len(items)
+    week_days = {int(key[-1]) for key in input_tasks}
+
+    groups = [] #(days, shift indexes)
+    for i, shift in enumerate(input_scheduled_shifts):
+        days = {int(day) for day in shift['days'].split(',')} & week_days
+        if not days:
+            continue
+        linked = [group for group in groups if group[0] & days]
+        groups = [group for group in groups if not group[0] & days]
+        groups.append((days.union(*(group[0] for group in linked)),
+                       sorted([i] + [k for group in linked for k in group[1]])))
+    for day in week_days - set().union(*(group[0] for group in groups)):
+        groups.append(({day}, []))
+
+    subproblems = []
+    for days, shift_ids in groups:
+        keys = [key for key in input_tasks if int(key[-1]) in days]
+        if not any(input_tasks[key] for key in keys):
+            continue
+        subproblems.append(({key: input_tasks[key] for key in keys},
+                            [input_scheduled_shifts[i] for i in shift_ids],
+                            [j for key in keys for j in task_ids[key]],
+                            shift_ids))
+    return subproblems
+
+
+#stop() of the decomposed run, in pool workers (set by init_subproblem_worker). An Event can only reach another
+#process by inheritance, so it comes in through the pool's initializer rather than with every subproblem
+worker_stop = None
+
+def init_subproblem_worker(stop):
+    global worker_stop
+    worker_stop = stop
+
+
+def solve_subproblem(tasks, shifts, kwargs):
+    if worker_stop is not None and 'stop' not in kwargs:
+        kwargs = dict(kwargs, stop=worker_stop)
+    return main_process(tasks, shifts, return_info=True, **kwargs)
+
+
+def group_key(tasks, shifts, kwargs):
+    #Content hash of a day group: its tasks per day in order, its shift templates and the solve arguments
+    options = {key: value for key, value in (kwargs.get('solver_options') or {}).items()
+               if key not in ('msg', 'warm_start', 'heuristic_start')}
+    arguments = dict(kwargs, solver_options=options)
+    return hashlib.sha256(json.dumps([list(tasks.items()), shifts, arguments], sort_keys=True, default=str).encode()).hexdigest()
+
+
+def previous_start(groups, task_keys, shifts):
+    #MIP start for a changed day group: earlier start times of the same (day, task index) and counts of the same shift templates
+    start_of, count_of = {}, {}
+    for group in groups:
+        _, _, sub_info = group['solution']
+        for j, t in sub_info['start_times'].items():
+            start_of[group['task_keys'][j]] = t
+        for i, amount in sub_info['shift_counts'].items():
+            count_of[json.dumps(group['shifts'][i], sort_keys=True)] = amount
+    return {'start_times': {j: start_of[key] for j, key in enumerate(task_keys) if key in start_of},
+            'shift_counts': {i: count_of.get(json.dumps(shift, sort_keys=True), 0) for i, shift in enumerate(shifts)}}
+
+
+def mip_start(data, options, initial_solution):
+    #The heuristic_solution as MIP start when heuristic_start is set and no initial_solution was given
+    if options['heuristic_start'] and not (options['warm_start'] and initial_solution):
+        solution = heuristic_solution(data)
+        if solution is not None:
+            return solution, dict(options, warm_start=True)
+    return initial_solution, options
+
+
+def decomposed_process(input_tasks,input_scheduled_shifts,max_workers=None,initial_solution=None,previous=None,
+                       progress=None,stop=None,**kwargs):
+    """Solve the independent day groups of split_by_day_groups in parallel processes.
+
+    previous is the info of an earlier decomposed run: day groups whose
+    tasks, shifts and arguments are unchanged reuse its solution, and the
+    changed ones are warm-started from it; groups whose solve was ended
+    early with stop are solved again. Returns (result, cost, info) merged
+    back into the shape of main_process; info['groups'] keeps the solution
+    of every group for the next incremental run. stop reaches every group's
+    solver; progress does only when a single group is solved, otherwise it
+    hears of every group that is done.
+    """
+    subproblems = split_by_day_groups(input_tasks,input_scheduled_shifts)
+    start = time.perf_counter()
+    previous_groups = (previous or {}).get('groups', [])
+    solved_before = {group['key']: group['solution'] for group in previous_groups
+                     if not group['solution'][2].get('stopped')}
+    records, jobs = [], []
+    for tasks, shifts, task_ids, shift_ids in subproblems:
+        task_keys = [(key, index) for key, items in tasks.items() for index in range(len(items))]
+        record = {'key': group_key(tasks, shifts, kwargs), 'task_keys': task_keys, 'shifts': shifts,
+                  'solution': None}
+        records.append(record)
+        if record['key'] in solved_before:
+            record['solution'] = solved_before[record['key']]
+            continue
+        sub_kwargs = dict(kwargs)
+        if initial_solution:
+            local_task = {j: k for k, j in enumerate(task_ids)}
+            sub_kwargs['initial_solution'] = {
+                'start_times': {local_task[j]: t for j, t in initial_solution['start_times'].items() if j in local_task},
+                'shift_counts': {k: initial_solution['shift_counts'].get(i, 0) for k, i in enumerate(shift_ids)}}
+        elif previous_groups:
+            sub_kwargs['initial_solution'] = previous_start(previous_groups, task_keys, shifts)
+            sub_kwargs['solver_options'] = dict(kwargs.get('solver_options') or {}, warm_start=True)
+        jobs.append((record, tasks, shifts, sub_kwargs))
+
+    if len(jobs) == 1:
+        #A single group (typically one edited day) is solved in this process: no pool start-up
+        record, tasks, shifts, sub_kwargs = jobs[0]
+        record['solution'] = solve_subproblem(tasks, shifts, dict(sub_kwargs, progress=progress, stop=stop))
+    elif jobs:
+        with ProcessPoolExecutor(max_workers=max_workers or min(len(jobs), os.cpu_count()) or 1,
+                                 initializer=init_subproblem_worker, initargs=(stop,)) as executor:
+            futures = [executor.submit(solve_subproblem, tasks, shifts, sub_kwargs) for _, tasks, shifts, sub_kwargs in jobs]
+            for done, ((record, _, _, _), future) in enumerate(zip(jobs, futures), 1):
+                record['solution'] = future.result()
+                if progress is not None:
+                    progress({'phase': 'solve', 'groups_done': done, 'groups': len(jobs),
+                              'elapsed': time.perf_counter() - start})
+    solutions = [record['solution'] for record in records]
+
+    result = {int(key[-1]): {} for key in input_tasks}
+    shift_counts = {i: 0.0 for i in range(len(input_scheduled_shifts))}
+    start_times = {}
+    assigned_nurses = {}
+    bounds = []
+    for (tasks, shifts, task_ids, shift_ids), (sub_result, sub_cost, sub_info) in zip(subproblems, solutions):
+        for day, day_result in sub_result.items():
+            for task_index, (time_interval_task, nurses) in day_result.items():
+                result[day][task_index] = [time_interval_task, [[shift_ids[i] for i in unit] for unit in nurses]]
+        for i, amount in sub_info['shift_counts'].items():
+            shift_counts[shift_ids[i]] = amount
+        for j, t in sub_info['start_times'].items():
+            start_times[task_ids[j]] = t
+        for j, units in sub_info['nurses'].items():
+            assigned_nurses[task_ids[j]] = [[(shift_ids[i], k) for i, k in unit] for unit in units]
+        bounds.append(sub_info['bound'])
+
+    infos = [solution[2] for solution in solutions]
+    status = 'optimal' if all(info['status'] == 'optimal' for info in infos) else 'feasible'
+    cost = sum(solution[1] for solution in solutions)
+    info = solve_info(infos[0]['solver'] if infos else DEFAULT_SOLVER_OPTIONS['solver'], status, cost,
+                      None if None in bounds else sum(bounds), time.perf_counter() - start)
+    info['shift_counts'] = shift_counts
+    info['start_times'] = start_times
+    info['nurses'] = assigned_nurses
+    info['subproblems'] = len(subproblems)
+    info['resolved'] = len(jobs)
+    info['groups'] = records
+    info['stopped'] = any(solution[2].get('stopped') for solution in solutions)
+    #Phase times summed over the subproblems solved in this run (they may overlap in wall time when run in parallel)
+    info['timings'] = {phase: sum(record['solution'][2]['timings'][phase] for record, _, _, _ in jobs)
+                       for phase in ('build', 'solve', 'extract', 'assign')}
+    return result, cost, info
+
+
+def main_process(input_tasks,input_scheduled_shifts,sparse=True,backend='pulp',
+                 solver_options=None,initial_solution=None,return_info=False,
+                 decompose=False,max_workers=None,aggregate=False,unit_minutes=TIME_UNIT_MINUTES,
+                 previous=None,check_input=True,progress=None,stop=None):
+    """Solve the week and assign nurses to the tasks.
+
+    backend='pulp' builds the model with PuLP objects; backend='mps' streams
+    the sparse model straight to an MPS file, which keeps memory flat on
+    large weeks. solver_options overrides DEFAULT_SOLVER_OPTIONS. Returns
+    (result, cost), or (result, cost, info) with return_info=True, where
+    info holds the solve status, gap, wall time and the seconds spent per
+    phase (info["timings"]: build, solve, extract, assign). info["nurses"]
+    names the nurse, a (shift, number) pair, on every time unit of every
+    task (see assign_nurses). Raises RuntimeError when the solver returns
+    no schedule.
+
+    decompose=True solves the groups of days that share no shift template
+    as separate models in up to max_workers processes. Passing the info of
+    an earlier decomposed run as previous re-solves only the day groups
+    that changed since, warm-started from it. aggregate=True uses
+    the exact event grid model (see model_data). Time units in the model
+    and in the result are unit_minutes long (15 by default).
+
+    With check_input=True the input first goes through precheck: tasks no
+    schedule can cover raise InfeasibleInput (a RuntimeError) before any
+    model is built, and info["lower_bound"] holds its demand lower bound.
+
+    progress, when given, is called with a dict for every phase started
+    ('precheck', 'build', 'solve', 'assign') and for every incumbent or
+    bound the solver reports ('incumbent', 'bound'), each with the seconds
+    'elapsed' since the call. Once stop() returns true the solver ends its
+    search and the best schedule found so far is returned, with
+    info["stopped"] set. Solver progress and stop need backend='mps' (the
+    PuLP backend only reports the phases) and, with decompose=True, a run
+    that solves a single day group.
+
+    Schedules can be solved concurrently in threads or processes: the only
+    module state is the stop() of a decomposed run, set in that run's own
+    pool processes (init_subproblem_worker), and the thread count of each
+    thread's HiGHS scheduler (highs_threads).
+    """
+    process_start = time.perf_counter()
+    def report(phase, **values):
+        if progress is not None:
+            progress(dict(values, phase=phase, elapsed=time.perf_counter() - process_start))
+
+    lower_bound = None
+    if check_input:
+        report('precheck')
+        check = precheck(input_tasks,input_scheduled_shifts,unit_minutes)
+        if check['problems']:
+            raise InfeasibleInput(check['problems'])
+        lower_bound = check['lower_bound']
+
+    if decompose or previous is not None:
+        result, cost, info = decomposed_process(task_dicts(input_tasks),input_scheduled_shifts,max_workers,initial_solution,previous,
+                                                sparse=sparse,backend=backend,solver_options=solver_options,
+                                                aggregate=aggregate,unit_minutes=unit_minutes,check_input=False,
+                                                progress=progress,stop=stop)
+        info['lower_bound'] = lower_bound
+        if return_info:
+            return result,cost,info
+        return result,cost
+
+    options = dict(DEFAULT_SOLVER_OPTIONS, **(solver_options or {}))
+    if options['solver'] not in SOLVERS:
+        raise ValueError(f"Unknown solver {options['solver']!r}, expected one of {SOLVERS}")
+
+    report('build')
+    build_start = time.perf_counter()
+    if options['solver'] == 'quick':
+        data = model_data(input_tasks,input_scheduled_shifts,aggregate,unit_minutes)
+        build_time = time.perf_counter() - build_start
+        report('solve')
+        amount_of_scheduled_nurses, starting_times_tasks, info = solve_quick(data)
+    elif backend == 'mps':
+        data = model_data(input_tasks,input_scheduled_shifts,aggregate,unit_minutes)
+        build_time = time.perf_counter() - build_start
+        initial_solution, options = mip_start(data, options, initial_solution)
+        report('solve')
+        amount_of_scheduled_nurses, starting_times_tasks, info = solve_mps(data, options, initial_solution,
+                                                                           lambda values: report('solve', **values), stop)
+    else:
+        data = build_model(input_tasks,input_scheduled_shifts,sparse,aggregate,unit_minutes)
+        build_time = time.perf_counter() - build_start
+        initial_solution, options = mip_start(data, options, initial_solution)
+        report('solve')
+        amount_of_scheduled_nurses, starting_times_tasks, info = solve_pulp(data, options, initial_solution)
+    info['timings']['build'] = build_time
+    info.setdefault('stopped', False)
+    if info['status'] not in SOLVED_STATUSES:
+        raise RuntimeError(f"{info['solver']} returned no schedule (status: {info['status']})")
+    cost = info['objective']
+    info['lower_bound'] = lower_bound
+    info['shift_counts'] = amount_of_scheduled_nurses
+    info['start_times'] = dict(starting_times_tasks)
+
+    set_L = data['set_L']
+    N = data['N']
+    D = data['D']
+
+    report('assign')
+    assign_start = time.perf_counter()
+    counts = [amount_of_scheduled_nurses[i] for i in data['set_I']]
+    assignment = assign_nurses(set_L, counts, starting_times_tasks, D, N)
+    info['nurses'] = assignment
+
+    tasks_indexes = data['task_index']
+    result = {day: {} for day in data['days']}
+
+    for task, start in starting_times_tasks:
         task_index = tasks_indexes[task]
-        time = int(row[2])
-        day = int(time/96)
-        time_interval_task = [t for t in range(time - day*96,time + D[task] - day*96)]
-        nurses = []
-        for t in range(time,time+D[task]):
-            nurses.append(take_nurse(t,N[task]))
+        day = start // units_per_day(unit_minutes)
+        day_start = day*units_per_day(unit_minutes)
+        time_interval_task = [t for t in range(start - day_start,start + D[task] - day_start)]
+        nurses = [[i for i, _ in unit] for unit in assignment[task]]
         result[day][task_index] = [time_interval_task,nurses]
-    return result,plp.value(opt_model.objective)
\ No newline at end of file
+    info['timings']['assign'] = time.perf_counter() - assign_start
+    if return_info:
+        return result,cost,info
+    return result,cost
\ No newline at end of file
@@ -0,0 +1,39 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import main
+from generate_random_task import generate_week
+
+
+def random_weeks(n, tasks_per_day=4):
+    weeks = []
+    for seed in range(n):
+        random.seed(seed)
+        weeks.append(generate_week(tasks_per_day))
+    return weeks
+
+
+@pytest.mark.parametrize('backend', ['pulp', 'mps'])
+def test_concurrent_main_process_matches_sequential(backend):
+    weeks = random_weeks(6)
+    def solve(week):
+        return main.main_process(*week, backend=backend, aggregate=True, solver_options={'msg': False})
+    sequential = [solve(week) for week in weeks]
+    with ThreadPoolExecutor(max_workers=len(weeks)) as executor:
+        parallel = list(executor.map(solve, weeks))
+    assert parallel == sequential
+
+
+def test_concurrent_highs_thread_counts():
+    #Every thread sizes its own HiGHS scheduler, whatever the other threads ask for
+    tasks, shifts = random_weeks(1)[0]
+    def solve(threads):
+        return main.main_process(tasks, shifts, backend='mps', aggregate=True, return_info=True,
+                                 solver_options={'solver': 'HiGHS', 'threads': threads, 'msg': False})
+    threads = [1, 2, None, 3, 2, None, 1]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        runs = list(executor.map(solve, threads))
+    assert [info['status'] for _, _, info in runs] == ['optimal'] * len(threads)
+    assert len({round(cost, 6) for _, cost, _ in runs}) == 1